@@ -2,23 +2,25 @@ import sqlite3
 import logging
 from telegram import Update, InlineKeyboardMarkup, InlineKeyboardButton
 from telegram.ext import ContextTypes, CommandHandler, CallbackQueryHandler
-from datetime import datetime, timedelta
 from config import DB_PATH
 import html
 
 logger = logging.getLogger(__name__)
 
+# Buttons never change, so the markup is built once and reused.
+_GROUP_STATS_MARKUP = InlineKeyboardMarkup([
+    [
+        InlineKeyboardButton("📊 Overview", callback_data="gstats_overview"),
+        InlineKeyboardButton("🌟 Top Players", callback_data="gstats_top_players"),
+    ],
+    [
+        InlineKeyboardButton("🕒 Activity", callback_data="gstats_activity"),
+    ],
+])
+
 def group_stats_buttons():
-    """Generate inline buttons for group stats categories."""
-    return InlineKeyboardMarkup([
-        [
-            InlineKeyboardButton("📊 Overview", callback_data="gstats_overview"),
-            InlineKeyboardButton("🌟 Top Players", callback_data="gstats_top_players"),
-        ],
-        [
-            InlineKeyboardButton("🕒 Activity", callback_data="gstats_activity"),
-        ],
-    ])
+    """Return the shared inline keyboard for group stats categories."""
+    return _GROUP_STATS_MARKUP
 
 async def gstats(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Show group-specific stats with buttons for detailed categories."""
@@ -126,8 +128,7 @@ async def gstats_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
         # Fetch active users (played in last 7 days)
         try:
-            seven_days_ago = datetime.datetime.now() - timedelta(days=7)
-            c.execute("SELECT COUNT(DISTINCT user_id) FROM users WHERE updated_at >= ? AND games_played > 0", (seven_days_ago,))
+            c.execute("SELECT COUNT(DISTINCT user_id) FROM users WHERE updated_at >= datetime('now', '-7 days') AND games_played > 0")
             active_users = c.fetchone()[0]
         except Exception as e:
             logger.error(f"Error fetching active_users for group {group_id}: {e}")
@@ -143,7 +144,7 @@ async def gstats_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
         # Fetch top 3 players
         try:
-            c.execute("SELECT first_name, username, wins, total_score FROM users WHERE games_played > 0 ORDER BY wins DESC, total_score DESC LIMIT 3")
+            c.execute("SELECT first_name, username, wins, total_score FROM users WHERE games_played > 0 ORDER BY IFNULL(wins, 0) DESC, IFNULL(total_score, 0) DESC LIMIT 3")
             top_players = c.fetchall()
             top_players_info = "\n".join(
                 f"{i+1}. {html.escape(row[0] or 'N/A')} (@{html.escape(row[1] or 'N/A')}) - {row[2]} wins, {row[3]} score"
@@ -1,13 +1,25 @@
+import asyncio
+import datetime
+import logging
+import os
 import sqlite3
-from telegram import Update, InlineKeyboardMarkup, InlineKeyboardButton, Chat
+import threading
+import time
+import aiofiles
+from telegram import Update, InlineKeyboardMarkup, InlineKeyboardButton, Chat, Message
+from telegram.error import BadRequest, RetryAfter
 from telegram.ext import (
     ApplicationBuilder,
+    CallbackQueryHandler,
     CommandHandler,
     ContextTypes,
     ChatMemberHandler,
 )
-from config import BOT_TOKEN, OWNER_ID, DB_PATH
+from config import BOT_TOKEN, OWNER_ID, DB_PATH, COPY_BUFFER_SIZE
 
+# Set up logging for debugging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
 
 
 # Log channel/group for new users/groups
@@ -15,89 +27,96 @@ LOG_CHAT_ID = -1002962367553 # Replace with your group ID
 
 
 # ---------------- Database ----------------
+# One connection for every DB read/write in this file (backups open their own).
+# Autocommit, WAL and the same pragmas as game.py's connection.
+_conn = sqlite3.connect(DB_PATH, timeout=10, check_same_thread=False, isolation_level=None)
+_conn.execute("PRAGMA journal_mode=WAL")
+_conn.execute("PRAGMA synchronous=NORMAL")
+_conn.execute("PRAGMA cache_size=-20000")
+_conn.execute("PRAGMA mmap_size=268435456")
+_db_lock = threading.Lock()  # handlers on the loop and worker threads share _conn
+
+
 def init_db():
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
+    with _db_lock:
+        c = _conn.cursor()
 
-    # Users table
-    c.execute(
+        # Users table
+        c.execute(
+            """
+            CREATE TABLE IF NOT EXISTS users (
+                user_id INTEGER PRIMARY KEY,
+                first_name TEXT,
+                username TEXT,
+                games_played INTEGER DEFAULT 0,
+                wins INTEGER DEFAULT 0,
+                losses INTEGER DEFAULT 0,
+                eliminations INTEGER DEFAULT 0,
+                total_score REAL DEFAULT 0,
+                last_score REAL DEFAULT 0,
+                penalties INTEGER DEFAULT 0,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
         """
-        CREATE TABLE IF NOT EXISTS users (
-            user_id INTEGER PRIMARY KEY,
-            first_name TEXT,
-            username TEXT,
-            games_played INTEGER DEFAULT 0,
-            wins INTEGER DEFAULT 0,
-            losses INTEGER DEFAULT 0,
-            eliminations INTEGER DEFAULT 0,
-            total_score REAL DEFAULT 0,
-            last_score REAL DEFAULT 0,
-            penalties INTEGER DEFAULT 0,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
         )
-    """
-    )
 
-    # Groups table
-    c.execute(
+        # Groups table
+        c.execute(
+            """
+            CREATE TABLE IF NOT EXISTS groups (
+                group_id INTEGER PRIMARY KEY,
+                title TEXT,
+                invite_link TEXT,
+                added_by TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
         """
-        CREATE TABLE IF NOT EXISTS groups (
-            group_id INTEGER PRIMARY KEY,
-            title TEXT,
-            invite_link TEXT,
-            added_by TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
         )
-    """
-    )
-
-    conn.commit()
-    conn.close()
 
 
 def save_user(user):
     """Save user to DB, return True if new user"""
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute("SELECT * FROM users WHERE user_id = ?", (user.id,))
-    existing = c.fetchone()
-    is_new = False
-    if not existing:
-        c.execute(
-            "INSERT INTO users (user_id, first_name, username) VALUES (?, ?, ?)",
-            (user.id, user.first_name, user.username),
-        )
-        is_new = True
-    else:
-        c.execute(
-            "UPDATE users SET updated_at = CURRENT_TIMESTAMP WHERE user_id = ?", (user.id,)
-        )
-    conn.commit()
-    conn.close()
+    with _db_lock:
+        c = _conn.cursor()
+        c.execute("SELECT * FROM users WHERE user_id = ?", (user.id,))
+        existing = c.fetchone()
+        is_new = False
+        if not existing:
+            c.execute(
+                "INSERT INTO users (user_id, first_name, username) VALUES (?, ?, ?)",
+                (user.id, user.first_name, user.username),
+            )
+            is_new = True
+        else:
+            c.execute(
+                "UPDATE users SET updated_at = CURRENT_TIMESTAMP WHERE user_id = ?", (user.id,)
+            )
+    if is_new:
+        import game
+
+        game.invalidate_leaderboard_cache()  # the ranked user count changed
     return is_new
 
 
 def save_group(chat: Chat, added_by):
     """Save group info to DB"""
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute("SELECT * FROM groups WHERE group_id = ?", (chat.id,))
-    existing = c.fetchone()
-    if not existing:
-        invite_link = chat.invite_link if hasattr(chat, "invite_link") and chat.invite_link else "N/A"
-        c.execute(
-            "INSERT INTO groups (group_id, title, invite_link, added_by) VALUES (?, ?, ?, ?)",
-            (chat.id, chat.title or "Private/Unknown", invite_link, added_by),
-        )
-    conn.commit()
-    conn.close()
+    with _db_lock:
+        c = _conn.cursor()
+        c.execute("SELECT * FROM groups WHERE group_id = ?", (chat.id,))
+        existing = c.fetchone()
+        if not existing:
+            invite_link = chat.invite_link if hasattr(chat, "invite_link") and chat.invite_link else "N/A"
+            c.execute(
+                "INSERT INTO groups (group_id, title, invite_link, added_by) VALUES (?, ?, ?, ?)",
+                (chat.id, chat.title or "Private/Unknown", invite_link, added_by),
+            )
 
 
 # ---------------- Handlers ----------------
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user = update.effective_user
-    is_new = save_user(user)
+    is_new = await asyncio.to_thread(save_user, user)
 
     welcome_text = """🎲 Welcome to <b>Mind Scale</b> 🎲
 
@@ -163,7 +182,7 @@ async def bot_added(update: Update, context: ContextTypes.DEFAULT_TYPE):
             pass
 
         # Save group to DB
-        save_group(chat, f"@{added_by.username or added_by.full_name}")
+        await asyncio.to_thread(save_group, chat, f"@{added_by.username or added_by.full_name}")
 
         # Log new group
         group_link = chat.invite_link if hasattr(chat, "invite_link") and chat.invite_link else "N/A"
@@ -172,63 +191,56 @@ async def bot_added(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await context.bot.send_message(chat_id=LOG_CHAT_ID, text=log_text)
 
 # stats.py (corrected to fix datetime and format specifier errors)
-import sqlite3
-import os
-from telegram import Update, InlineKeyboardMarkup, InlineKeyboardButton
-from telegram.ext import ContextTypes, CallbackQueryHandler
-from telegram.error import BadRequest
-from datetime import datetime, timedelta
-from config import DB_PATH  # Ensure DB_PATH is defined in config.py
-import logging
 
-logger = logging.getLogger(__name__)
+# Every users/groups aggregate the stats screens show, from one pass over users
+_STATS_TOTALS_SQL = """
+    SELECT
+        COUNT(*),
+        (SELECT COUNT(*) FROM groups),
+        IFNULL(SUM(wins), 0),
+        IFNULL(SUM(losses), 0),
+        IFNULL(SUM(games_played), 0),
+        IFNULL(SUM(penalties), 0),
+        IFNULL(AVG(total_score), 0),
+        IFNULL(SUM(games_played = 0), 0),
+        IFNULL(SUM(updated_at >= datetime('now', '-7 days')), 0),
+        IFNULL(SUM(updated_at >= datetime('now', '-1 day') AND games_played > 0), 0),
+        IFNULL(SUM(created_at >= datetime('now', '-7 days')), 0)
+    FROM users
+"""
+_STATS_OVERVIEW_SQL = """
+    SELECT COUNT(*), (SELECT COUNT(*) FROM groups), IFNULL(SUM(games_played), 0) FROM users
+"""
+
+# Static keyboard: built once at import, PTB markups are immutable so one instance is shared.
+_STATS_MARKUP = InlineKeyboardMarkup([
+    [
+        InlineKeyboardButton("📊 Bot Stats", callback_data="stats_bot"),
+        InlineKeyboardButton("👥 User Stats", callback_data="stats_users"),
+    ],
+    [
+        InlineKeyboardButton("🏘 Group Stats", callback_data="stats_groups"),
+        InlineKeyboardButton("🌟 Top Players", callback_data="stats_top_players"),
+    ],
+])
 
 def stats_buttons():
-    """Generate inline buttons for stats categories."""
-    return InlineKeyboardMarkup([
-        [
-            InlineKeyboardButton("📊 Bot Stats", callback_data="stats_bot"),
-            InlineKeyboardButton("👥 User Stats", callback_data="stats_users"),
-        ],
-        [
-            InlineKeyboardButton("🏘 Group Stats", callback_data="stats_groups"),
-            InlineKeyboardButton("🌟 Top Players", callback_data="stats_top_players"),
-        ],
-    ])
+    """Return the shared inline keyboard for stats categories."""
+    return _STATS_MARKUP
+
+def _stats_overview():
+    """Total users, groups and games; "N/A" for each on failure."""
+    try:
+        with _db_lock:
+            return _conn.execute(_STATS_OVERVIEW_SQL).fetchone()
+    except Exception as e:
+        logger.error(f"Error fetching stats totals: {e}")
+        return ("N/A",) * 3
 
 async def stats(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Show a concise bot stats overview with buttons for detailed categories."""
-    total_users = total_groups = total_games = "N/A"
-
     try:
-        conn = sqlite3.connect(DB_PATH, timeout=10)
-        c = conn.cursor()
-
-        # Fetch total users
-        try:
-            c.execute("SELECT COUNT(*) FROM users")
-            total_users = c.fetchone()[0]
-        except Exception as e:
-            logger.error(f"Error fetching total_users: {e}")
-            total_users = "N/A"
-
-        # Fetch total groups
-        try:
-            c.execute("SELECT COUNT(*) FROM groups")
-            total_groups = c.fetchone()[0]
-        except Exception as e:
-            logger.error(f"Error fetching total_groups: {e}")
-            total_groups = "N/A"
-
-        # Fetch total games
-        try:
-            c.execute("SELECT SUM(games_played) FROM users")
-            total_games = c.fetchone()[0] or 0
-        except Exception as e:
-            logger.error(f"Error fetching total_games: {e}")
-            total_games = "N/A"
-
-        conn.close()
+        total_users, total_groups, total_games = await asyncio.to_thread(_stats_overview)
 
         overview_text = (
             "<b>Bot Statistics</b>\n\n"
@@ -246,6 +258,47 @@ async def stats(update: Update, context: ContextTypes.DEFAULT_TYPE):
         logger.error(f"Critical error in stats command: {e}")
         await update.message.reply_text("❌ Critical error fetching stats. Please try again later.")
 
+def _stats_totals():
+    """All counts and sums for the stats pages in one row; "N/A" for each on failure."""
+    try:
+        return _conn.execute(_STATS_TOTALS_SQL).fetchone()
+    except Exception as e:
+        logger.error(f"Error fetching stats totals: {e}")
+        return ("N/A",) * 11
+
+def _stats_top_players():
+    """Formatted top-3 players by wins."""
+    try:
+        top_players = _conn.execute(
+            "SELECT first_name, username, wins FROM users ORDER BY IFNULL(wins, 0) DESC LIMIT 3"
+        ).fetchall()
+    except Exception as e:
+        logger.error(f"Error fetching top_players: {e}")
+        return "N/A"
+    return "\n".join(
+        f"{i+1}. {row[0] or 'N/A'} (@{row[1] or 'N/A'}) - {row[2]} wins"
+        for i, row in enumerate(top_players)
+    ) if top_players else "No players with wins yet."
+
+def _stats_most_active_group():
+    """Formatted group with the most games played."""
+    try:
+        most_active_group = _conn.execute(
+            "SELECT title, group_id, games_played FROM groups ORDER BY games_played DESC LIMIT 1"
+        ).fetchone()
+    except Exception as e:
+        logger.error(f"Error fetching most_active_group: {e}")
+        return "N/A"
+    return (
+        f"{most_active_group[0]} (ID: {most_active_group[1]}, Games: {most_active_group[2]})"
+        if most_active_group and most_active_group[2] > 0 else "No games played yet."
+    )
+
+def _stats_details():
+    """Totals, top players and most active group, read under one hold of _db_lock."""
+    with _db_lock:
+        return _stats_totals(), _stats_top_players(), _stats_most_active_group()
+
 async def stats_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle button clicks for detailed stats with clean formatting."""
     query = update.callback_query
@@ -264,36 +317,13 @@ async def stats_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
             logger.error(f"Error sending same-category message: {e}")
         return
 
-    total_users = total_groups = total_wins = total_losses = total_games = total_penalties = "N/A"
-    db_size_mb = storage_percentage = active_users = recent_games = avg_games_per_user = "N/A"
-    avg_score = top_players_info = most_active_group_info = inactive_users = win_rate = recent_registrations = "N/A"
+    db_size_mb = storage_percentage = avg_games_per_user = win_rate = "N/A"
 
     try:
-        conn = sqlite3.connect(DB_PATH, timeout=10)
-        c = conn.cursor()
-
-        # Fetch all required data with individual error handling
-        try:
-            c.execute("SELECT COUNT(*) FROM users")
-            total_users = c.fetchone()[0]
-        except Exception as e:
-            logger.error(f"Error fetching total_users: {e}")
-
-        try:
-            c.execute("SELECT COUNT(*) FROM groups")
-            total_groups = c.fetchone()[0]
-        except Exception as e:
-            logger.error(f"Error fetching total_groups: {e}")
-
-        try:
-            c.execute("SELECT SUM(wins), SUM(losses), SUM(games_played), SUM(penalties) FROM users")
-            sums = c.fetchone()
-            total_wins = sums[0] or 0
-            total_losses = sums[1] or 0
-            total_games = sums[2] or 0
-            total_penalties = sums[3] or 0
-        except Exception as e:
-            logger.error(f"Error fetching user sums: {e}")
+        # All three reads share _conn, so they run back to back in one worker thread
+        totals, top_players_info, most_active_group_info = await asyncio.to_thread(_stats_details)
+        (total_users, total_groups, total_wins, total_losses, total_games, total_penalties,
+         avg_score, inactive_users, active_users, recent_games, recent_registrations) = totals
 
         try:
             db_size_bytes = os.path.getsize(DB_PATH) if os.path.exists(DB_PATH) else 0
@@ -302,72 +332,16 @@ async def stats_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
         except Exception as e:
             logger.error(f"Error fetching DB size: {e}")
 
-        try:
-            seven_days_ago = datetime.datetime.now() - timedelta(days=7)
-            c.execute("SELECT COUNT(DISTINCT user_id) FROM users WHERE updated_at >= ?", (seven_days_ago,))
-            active_users = c.fetchone()[0]
-        except Exception as e:
-            logger.error(f"Error fetching active_users: {e}")
-
-        try:
-            one_day_ago = datetime.datetime.now() - timedelta(days=1)
-            c.execute("SELECT COUNT(*) FROM users WHERE updated_at >= ? AND games_played > 0", (one_day_ago,))
-            recent_games = c.fetchone()[0]
-        except Exception as e:
-            logger.error(f"Error fetching recent_games: {e}")
-
         try:
             avg_games_per_user = total_games / total_users if isinstance(total_users, int) and total_users > 0 else 0
         except Exception as e:
             logger.error(f"Error calculating avg_games_per_user: {e}")
 
-        try:
-            c.execute("SELECT first_name, username, wins FROM users ORDER BY wins DESC LIMIT 3")
-            top_players = c.fetchall()
-            top_players_info = "\n".join(
-                f"{i+1}. {row[0] or 'N/A'} (@{row[1] or 'N/A'}) - {row[2]} wins"
-                for i, row in enumerate(top_players)
-            ) if top_players else "No players with wins yet."
-        except Exception as e:
-            logger.error(f"Error fetching top_players: {e}")
-            top_players_info = "N/A"
-
-        try:
-            c.execute("SELECT AVG(total_score) FROM users")
-            avg_score = c.fetchone()[0] or 0
-        except Exception as e:
-            logger.error(f"Error fetching avg_score: {e}")
-
-        try:
-            c.execute("SELECT title, group_id, games_played FROM groups ORDER BY games_played DESC LIMIT 1")
-            most_active_group = c.fetchone()
-            most_active_group_info = (
-                f"{most_active_group[0]} (ID: {most_active_group[1]}, Games: {most_active_group[2]})"
-                if most_active_group and most_active_group[2] > 0 else "No games played yet."
-            )
-        except Exception as e:
-            logger.error(f"Error fetching most_active_group: {e}")
-            most_active_group_info = "N/A"
-
-        try:
-            c.execute("SELECT COUNT(*) FROM users WHERE games_played = 0")
-            inactive_users = c.fetchone()[0]
-        except Exception as e:
-            logger.error(f"Error fetching inactive_users: {e}")
-
         try:
             win_rate = (total_wins / total_games * 100) if isinstance(total_games, int) and total_games > 0 else 0
         except Exception as e:
             logger.error(f"Error calculating win_rate: {e}")
 
-        try:
-            c.execute("SELECT COUNT(*) FROM users WHERE created_at >= ?", (seven_days_ago,))
-            recent_registrations = c.fetchone()[0]
-        except Exception as e:
-            logger.error(f"Error fetching recent_registrations: {e}")
-
-        conn.close()
-
         # Prepare response based on button clicked
         if selected_category == "bot":
             text = (
@@ -423,9 +397,6 @@ async def stats_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     except Exception as e:
         logger.error(f"Critical error in stats_callback: {e}")
         await query.message.reply_text("❌ Critical error fetching stats. Try again later.")
-import game
-from telegram import Update
-from telegram.ext import CommandHandler, ContextTypes, MessageHandler, filters
 
 # ---------------- /getid COMMAND ----------------
 async def getid_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -445,58 +416,63 @@ async def getid_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await update.message.reply_text(f"✅ Video file_id:\n<code>{file_id}</code>", parse_mode="HTML")
 
 
-from telegram import Message, Update
-from telegram.ext import ContextTypes
-import sqlite3
-import asyncio
-import logging
+# Both recipient lists in one statement; the first column says which list a row belongs to
+_BROADCAST_IDS_SQL = "SELECT 0, group_id FROM groups UNION ALL SELECT 1, user_id FROM users"
 
-# Set up logging for debugging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
-logger = logging.getLogger(__name__)
-
-async def fetch_ids(db_path):
+def _get_ids():
+    try:
+        with _db_lock:
+            rows = _conn.execute(_BROADCAST_IDS_SQL).fetchall()
+    except Exception as e:
+        logger.error(f"Error fetching IDs: {e}")
+        return [], []
+    ids = ([], [])
+    for kind, chat_id in rows:
+        ids[kind].append(chat_id)
+    return ids
+
+async def fetch_ids():
     """Fetch group and user IDs in a separate thread."""
-    loop = asyncio.get_event_loop()
-    def get_ids():
-        try:
-            conn = sqlite3.connect(db_path)
-            c = conn.cursor()
-            c.execute("SELECT group_id FROM groups")
-            groups = [row[0] for row in c.fetchall()]
-            c.execute("SELECT user_id FROM users")
-            users = [row[0] for row in c.fetchall()]
-            conn.close()
-            return groups, users
-        except Exception as e:
-            logger.error(f"Error fetching IDs: {e}")
-            return [], []
-    return await loop.run_in_executor(None, get_ids)
+    return await asyncio.to_thread(_get_ids)
+
+BROADCAST_CONCURRENCY = 20  # copies in flight at once
+BROADCAST_RATE = 25         # copies started per second; Telegram allows about 30
 
 async def broadcast_task(bot, reply: Message, groups: list, users: list, owner_id: int):
     """Background broadcast fully detached from update."""
-    success_groups = 0
-    success_users = 0
-
-    # Broadcast to groups
-    for gid in groups:
-        try:
-            await reply.forward(chat_id=gid)
-            success_groups += 1
-            await asyncio.sleep(0.05)  # Small delay to respect Telegram rate limits
-        except Exception as e:
-            logger.debug(f"Failed to forward to group {gid}: {e}")
-            continue
-
-    # Broadcast to users
-    for uid in users:
-        try:
-            await reply.forward(chat_id=uid)
-            success_users += 1
-            await asyncio.sleep(0.05)  # Small delay to respect Telegram rate limits
-        except Exception as e:
-            logger.debug(f"Failed to forward to user {uid}: {e}")
-            continue
+    loop = asyncio.get_running_loop()
+    sem = asyncio.Semaphore(BROADCAST_CONCURRENCY)
+    next_slot = loop.time()
+
+    async def copy_one(kind: str, chat_id: int) -> bool:
+        nonlocal next_slot
+        async with sem:
+            # Hand out start times 1/BROADCAST_RATE apart so bursts stay under the API limit
+            now = loop.time()
+            slot = max(now, next_slot)
+            next_slot = slot + 1 / BROADCAST_RATE
+            if slot > now:
+                await asyncio.sleep(slot - now)
+            for attempt in range(2):
+                try:
+                    await bot.copy_message(chat_id=chat_id, from_chat_id=reply.chat_id, message_id=reply.message_id)
+                    return True
+                except RetryAfter as e:
+                    if attempt:
+                        logger.debug(f"Failed to copy to {kind} {chat_id}: {e}")
+                        return False
+                    await asyncio.sleep(e.retry_after)
+                except Exception as e:
+                    logger.debug(f"Failed to copy to {kind} {chat_id}: {e}")
+                    return False
+
+    # Groups are queued first, so they still go out ahead of users
+    results = await asyncio.gather(
+        *(copy_one("group", gid) for gid in groups),
+        *(copy_one("user", uid) for uid in users),
+    )
+    success_groups = sum(results[:len(groups)])
+    success_users = sum(results[len(groups):])
 
     # Log result to owner
     try:
@@ -509,8 +485,6 @@ async def broadcast_task(bot, reply: Message, groups: list, users: list, owner_i
 
 async def broadcast_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Broadcast a replied message to all users and groups (OWNER ONLY)."""
-    from config import DB_PATH, OWNER_ID  # Import here to avoid circular imports
-
     user = update.effective_user
     if user.id != OWNER_ID:
         await update.message.reply_text("❌ You are not authorized to use this command.")
@@ -530,7 +504,7 @@ async def broadcast_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     # Fetch IDs in a separate thread
     try:
-        groups, users = await fetch_ids(DB_PATH)
+        groups, users = await fetch_ids()
     except Exception as e:
         logger.error(f"Failed to fetch IDs: {e}")
         await update.message.reply_text("❌ Failed to fetch recipients. Try again later.")
@@ -544,16 +518,67 @@ async def broadcast_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         logger.error(f"Failed to start broadcast task: {e}")
         await update.message.reply_text("❌ Failed to start broadcast. Try again later.")
 
-import os
-import shutil
-import datetime
-import asyncio
-from telegram import Update, InputFile
-from telegram.ext import ContextTypes, CommandHandler, MessageHandler, filters
-
 BACKUP_FOLDER = "backups"  # folder to store auto backups
+BACKUP_RETENTION_DAYS = 7  # older files in BACKUP_FOLDER are deleted after each backup
 os.makedirs(BACKUP_FOLDER, exist_ok=True)
 
+def _create_backup_file(prefix: str) -> str:
+    """
+    Snapshot the live DB into BACKUP_FOLDER with SQLite's online backup API.
+    Unlike a plain file copy it includes pages still in the -wal file and
+    never captures a half-written transaction. Returns the backup's path.
+    """
+    backup_path = os.path.join(BACKUP_FOLDER, f"{prefix}_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.db")
+    src = sqlite3.connect(DB_PATH)
+    dst = sqlite3.connect(backup_path)
+    try:
+        page_size = src.execute("PRAGMA page_size").fetchone()[0]
+        src.backup(dst, pages=max(1, COPY_BUFFER_SIZE // page_size))
+    finally:
+        dst.close()
+        src.close()
+    return backup_path
+
+def _prune_backups(cutoff: float) -> int:
+    """Delete files in BACKUP_FOLDER last modified before cutoff in one directory pass; returns how many."""
+    removed = 0
+    with os.scandir(BACKUP_FOLDER) as it:
+        for entry in it:
+            if entry.is_file() and entry.stat().st_mtime < cutoff:
+                os.remove(entry.path)
+                removed += 1
+    return removed
+
+def _restore_db_file(src_path: str):
+    """
+    Restore the live DB from an uploaded backup. The upload must pass
+    PRAGMA integrity_check before anything is written; the pages then go in
+    through game.restore_db's backup into the shared game connection. _conn
+    is held meanwhile and sees the restored data through the WAL.
+    """
+    import game
+
+    check = sqlite3.connect(f"file:{src_path}?mode=ro", uri=True)
+    try:
+        result = check.execute("PRAGMA integrity_check").fetchone()[0]
+        page_size = check.execute("PRAGMA page_size").fetchone()[0]
+    finally:
+        check.close()
+    if result != "ok":
+        raise ValueError(f"backup failed integrity check: {result}")
+    with _db_lock:
+        game.restore_db(src_path, pages=max(1, COPY_BUFFER_SIZE // page_size))
+
+async def _send_backup_to_owner(bot, backup_path: str, caption: str = None):
+    """
+    DM a backup file to the owner. PTB 20 reads a path or file object into
+    memory on the event loop before uploading, so the bytes are read with
+    aiofiles and handed over as-is.
+    """
+    async with aiofiles.open(backup_path, "rb") as f:
+        data = await f.read()
+    await bot.send_document(chat_id=OWNER_ID, document=data, filename=os.path.basename(backup_path), caption=caption)
+
 # ---------------- /backup COMMAND ----------------
 async def backup_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if update.effective_user.id != OWNER_ID:
@@ -562,11 +587,10 @@ async def backup_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     try:
         await update.message.reply_text("💾 Preparing database backup...")
-        backup_path = os.path.join(BACKUP_FOLDER, f"db_backup_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.db")
-        shutil.copyfile(DB_PATH, backup_path)
+        backup_path = await asyncio.to_thread(_create_backup_file, "db_backup")
 
-        with open(backup_path, "rb") as f:
-            await context.bot.send_document(chat_id=OWNER_ID, document=InputFile(f, filename=os.path.basename(backup_path)))
+        await _send_backup_to_owner(context.bot, backup_path)
+        await asyncio.to_thread(_prune_backups, time.time() - BACKUP_RETENTION_DAYS * 86400)
 
         await update.message.reply_text("✅ Backup sent to your DM!")
     except Exception as e:
@@ -576,11 +600,9 @@ async def backup_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 async def auto_backup(app):
     while True:
         try:
-            backup_path = os.path.join(BACKUP_FOLDER, f"auto_backup_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.db")
-            shutil.copyfile(DB_PATH, backup_path)
-            with open(backup_path, "rb") as f:
-                await app.bot.send_document(chat_id=OWNER_ID, document=InputFile(f, filename=os.path.basename(backup_path)),
-                                            caption="💾 Auto backup (every 12 hours)")
+            backup_path = await asyncio.to_thread(_create_backup_file, "auto_backup")
+            await _send_backup_to_owner(app.bot, backup_path, caption="💾 Auto backup (every 12 hours)")
+            await asyncio.to_thread(_prune_backups, time.time() - BACKUP_RETENTION_DAYS * 86400)
         except Exception as e:
             print(f"Auto backup failed: {e}")
         await asyncio.sleep(12 * 3600)  # 12 hours
@@ -606,18 +628,13 @@ async def restore_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         file_path = os.path.join(BACKUP_FOLDER, f"restore_{file.file_name}")
         await file_obj.download_to_drive(file_path)  # await the download
 
-        # Overwrite current database
-        shutil.copyfile(file_path, DB_PATH)
+        # Validate the upload, then restore it into the live database
+        await asyncio.to_thread(_restore_db_file, file_path)
         await update.message.reply_text("✅ Database restored successfully!")
     except Exception as e:
         await update.message.reply_text(f"❌ Failed to restore database: {e}")
 
 
-from telegram import Update, InlineKeyboardMarkup, InlineKeyboardButton
-from telegram.ext import ContextTypes, CallbackQueryHandler, CommandHandler
-from telegram import InlineKeyboardMarkup, InlineKeyboardButton, Update
-from telegram.ext import ContextTypes
-
 GUIDE_TEXTS = {
     "commands": (
         "📜 <b>Commands:</b>\n"
@@ -9,6 +9,7 @@ LOG_CHAT_ID = "-1002898222347"
 OWNER_ID = 7995262033  
 
 DB_PATH = "mindscale.db"
+COPY_BUFFER_SIZE = 4 * 1024 * 1024  # bytes moved per step when backing up / restoring the DB
 
 MIN_PLAYERS = 5
 ROUND_TIME_SEC = 120
@@ -2,6 +2,13 @@
 import sqlite3
 import asyncio
 import math
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import lru_cache
+from itertools import islice
 from typing import Dict, Optional
 from telegram import (
     Update,
@@ -9,6 +16,7 @@ from telegram import (
     InlineKeyboardButton,
     Message,
 )
+from telegram.error import RetryAfter
 from telegram.ext import (
     CommandHandler,
     ContextTypes,
@@ -25,8 +33,41 @@ MAX_PLAYERS = 7      # new: maximum number of players
 JOIN_TIME_SEC = 150
 PICK_TIME_SEC = 120
        # Time for players to DM their pick each round
-active_games: Dict[int, "MindScaleGame"] = {}   # group_id -> game instance
-user_active_game: Dict[int, int] = {}           # user_id -> group_id (which group they're playing in)
+
+
+class GameRegistry:
+    """
+    Live games by group and the group each player is in. Both maps are
+    only changed through these methods so they can't drift apart.
+    """
+    __slots__ = ("by_group", "user_to_group")
+
+    def __init__(self):
+        self.by_group: Dict[int, "MindScaleGame"] = {}   # group_id -> game instance
+        self.user_to_group: Dict[int, int] = {}          # user_id -> group_id (which group they're playing in)
+
+    def add_game(self, game: "MindScaleGame"):
+        self.by_group[game.group_id] = game
+
+    def add_player(self, game: "MindScaleGame", user_id: int):
+        self.user_to_group[user_id] = game.group_id
+
+    def drop_player(self, user_id: int):
+        self.user_to_group.pop(user_id, None)
+
+    def drop_game(self, group_id: int) -> Optional["MindScaleGame"]:
+        """Forget the game and every one of its players; returns the game, if there was one."""
+        game = self.by_group.pop(group_id, None)
+        if game is not None:
+            for uid in game.players:
+                self.user_to_group.pop(uid, None)
+        return game
+
+
+REGISTRY = GameRegistry()
+# Read-only views kept under their old names for the lookups all over this module
+active_games = REGISTRY.by_group
+user_active_game = REGISTRY.user_to_group
 
 # Placeholder file IDs for videos (replace with real Telegram file_ids or URLs)
 VIDEO_ROUND_ANNOUNCE = "BAACAgUAAyEFAAS3OY5mAAIH_WjcAQai-HhFDKRdLmAMLxBm27m3AAJVHwAC00rhVpV-sXiybqzWNgQ"    # video shown at round start
@@ -37,91 +78,141 @@ VIDEO_WINNER = "BAACAgUAAyEFAAS3OY5mAAIG_mjcAQWjT5k0VtEounHroJd-hiHfAAJrHgAC00rh
 
 
 # -------------------- DATABASE --------------------
+_schema_ready = False  # set once the tables have been created for this process
+_schema_checked = False  # set once ensure_columns_exist() has verified the users columns
+
+# One long-lived connection shared by every game DB helper. It runs in
+# autocommit mode; multi-statement writes go through _transaction().
+_conn = sqlite3.connect(DB_PATH, check_same_thread=False, isolation_level=None, cached_statements=256)
+_conn.execute("PRAGMA journal_mode=WAL")
+_conn.execute("PRAGMA wal_autocheckpoint=1000")
+_conn.execute("PRAGMA synchronous=NORMAL")
+_conn.execute("PRAGMA temp_store=MEMORY")
+_conn.execute("PRAGMA cache_size=-65536")
+_conn.execute("PRAGMA mmap_size=268435456")
+_db_lock = threading.RLock()  # sqlite3 connections must not be used concurrently
+# Every game DB call runs on this one thread, so calls queue here instead of
+# holding default-pool threads while they wait for _db_lock.
+_db_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="game-db")
+
+
+async def run_db(fn, *args):
+    """Await a blocking DB helper on the game DB thread."""
+    return await asyncio.get_running_loop().run_in_executor(_db_executor, fn, *args)
+
+
+# Statements used on hot paths. Reusing the same SQL text keeps them in the
+# connection's prepared-statement cache.
+SQL_SELECT_USER = "SELECT user_id FROM users WHERE user_id = ?"
+SQL_INSERT_USER = "INSERT INTO users (user_id, first_name, username) VALUES (?, ?, ?)"
+SQL_INSERT_USER_IF_MISSING = "INSERT OR IGNORE INTO users (user_id, first_name, username) VALUES (?, ?, ?)"
+SQL_UPSERT_USER = """
+    INSERT INTO users (user_id, first_name, username) VALUES (?, ?, ?)
+    ON CONFLICT(user_id) DO UPDATE SET
+        first_name = excluded.first_name,
+        username = excluded.username,
+        updated_at = CURRENT_TIMESTAMP
+"""
+SQL_UPSERT_GROUP = """
+    INSERT INTO groups (group_id, title, games_played) VALUES (?, ?, 0)
+    ON CONFLICT(group_id) DO UPDATE SET title = excluded.title
+"""
+SQL_COUNT_GROUP_GAME = """
+    INSERT INTO groups (group_id, title, games_played) VALUES (?, 'Unknown Group', 1)
+    ON CONFLICT(group_id) DO UPDATE SET games_played = games_played + 1
+"""
+SQL_UPDATE_STATS = """
+    UPDATE users
+    SET games_played = games_played + 1,
+        wins = wins + ?,
+        losses = losses + ?,
+        rounds_played = rounds_played + ?,
+        eliminations = eliminations + ?,
+        total_score = total_score + ?,
+        penalties = penalties + ?,
+        last_score = ?,
+        updated_at = CURRENT_TIMESTAMP
+    WHERE user_id = ?
+"""
+
+
+@contextmanager
+def _transaction():
+    """Run the enclosed statements on the shared connection as one transaction."""
+    with _db_lock:
+        _conn.execute("BEGIN")
+        try:
+            yield _conn
+        except BaseException:
+            _conn.execute("ROLLBACK")
+            raise
+        _conn.execute("COMMIT")
+
+
+# Leaderboard cache: the ranked user count and each rendered page, dropped after _LB_TTL seconds or as soon as a stats write invalidates it.
+_LB_TTL = 30
+_LB_CACHE = {"ts": 0.0, "count": 0, "pages": {}}
+
+
+def invalidate_leaderboard_cache():
+    _LB_CACHE["ts"] = 0.0
+
+
 def init_user_table():
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute(
-        """
-        CREATE TABLE IF NOT EXISTS users (
-            user_id INTEGER PRIMARY KEY,
-            first_name TEXT,
-            username TEXT,
-            games_played INTEGER DEFAULT 0,
-            wins INTEGER DEFAULT 0,
-            losses INTEGER DEFAULT 0,
-            rounds_played INTEGER DEFAULT 0,
-            eliminations INTEGER DEFAULT 0,
-            total_score INTEGER DEFAULT 0,
-            last_score INTEGER DEFAULT 0,
-            penalties INTEGER DEFAULT 0,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    with _db_lock:
+        _conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS users (
+                user_id INTEGER PRIMARY KEY,
+                first_name TEXT,
+                username TEXT,
+                games_played INTEGER DEFAULT 0,
+                wins INTEGER DEFAULT 0,
+                losses INTEGER DEFAULT 0,
+                rounds_played INTEGER DEFAULT 0,
+                eliminations INTEGER DEFAULT 0,
+                total_score INTEGER DEFAULT 0,
+                last_score INTEGER DEFAULT 0,
+                penalties INTEGER DEFAULT 0,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+            """
         )
-        """
-    )
-    conn.commit()
-    conn.close()
 
 
 
 def init_group_table():
     """Initialize the groups table with a games_played column."""
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute(
-        """
-        CREATE TABLE IF NOT EXISTS groups (
-            group_id INTEGER PRIMARY KEY,
-            title TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            games_played INTEGER DEFAULT 0
+    with _db_lock:
+        _conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS groups (
+                group_id INTEGER PRIMARY KEY,
+                title TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                games_played INTEGER DEFAULT 0
+            )
+            """
         )
-        """
-    )
-    # Ensure games_played column exists
-    c.execute("PRAGMA table_info(groups)")
-    columns = [col[1] for col in c.fetchall()]
-    if "games_played" not in columns:
-        c.execute("ALTER TABLE groups ADD COLUMN games_played INTEGER DEFAULT 0")
-    conn.commit()
-    conn.close()
+        # Ensure games_played column exists
+        columns = [col[1] for col in _conn.execute("PRAGMA table_info(groups)").fetchall()]
+        if "games_played" not in columns:
+            _conn.execute("ALTER TABLE groups ADD COLUMN games_played INTEGER DEFAULT 0")
+        # Most-active-group lookup in /stats reads the first entry
+        _conn.execute("CREATE INDEX IF NOT EXISTS idx_groups_games_played ON groups(games_played DESC)")
 
 def ensure_group_exists(group_id: int, title: str):
-    """Insert group into groups table if not present."""
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute("SELECT group_id FROM groups WHERE group_id = ?", (group_id,))
-    if not c.fetchone():
-        c.execute(
-            "INSERT INTO groups (group_id, title, games_played) VALUES (?, ?, 0)",
-            (group_id, title)
-        )
-    else:
-        c.execute(
-            "UPDATE groups SET title = ?, updated_at = CURRENT_TIMESTAMP WHERE group_id = ?",
-            (title, group_id)
-        )
-    conn.commit()
-    conn.close()
+    """Insert group into groups table if not present, otherwise refresh its title."""
+    with _db_lock:
+        _conn.execute(SQL_UPSERT_GROUP, (group_id, title))
 
 
 def ensure_user_exists(user):
-    """Insert user if not present"""
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute("SELECT user_id FROM users WHERE user_id = ?", (user.id,))
-    if not c.fetchone():
-        c.execute(
-            "INSERT INTO users (user_id, first_name, username) VALUES (?, ?, ?)",
-            (user.id, user.first_name, user.username),
-        )
-    else:
-        c.execute(
-            "UPDATE users SET first_name = ?, username = ?, updated_at = CURRENT_TIMESTAMP WHERE user_id = ?",
-            (user.first_name, user.username, user.id),
-        )
-    conn.commit()
-    conn.close()
+    """Insert user if not present, otherwise refresh their name"""
+    with _db_lock:
+        _conn.execute(SQL_UPSERT_USER, (user.id, user.first_name, user.username))
+    invalidate_leaderboard_cache()
 
 def update_user_after_game(user_id: int, score_delta: int, won: bool, rounds_played: int, eliminated: bool, penalties: int):
     """
@@ -132,36 +223,45 @@ def update_user_after_game(user_id: int, score_delta: int, won: bool, rounds_pla
     eliminated: True if eliminated
     penalties: total penalties to add
     """
-    conn = sqlite3.connect(DB_PATH)
-    ensure_columns_exist()
-    c = conn.cursor()
-    # ensure row exists
-    c.execute("SELECT user_id FROM users WHERE user_id = ?", (user_id,))
-    if not c.fetchone():
-        # if somehow absent, just create
-        c.execute("INSERT INTO users (user_id, first_name, username) VALUES (?, ?, ?)", (user_id, "", ""))
-    # update aggregated stats
-    c.execute(
-        """
-        UPDATE users
-        SET games_played = games_played + 1,
-            wins = wins + ?,
-            losses = losses + ?,
-            rounds_played = rounds_played + ?,
-            eliminations = eliminations + ?,
-            total_score = total_score + ?,
-            penalties = penalties + ?,
-            last_score = ?
-        WHERE user_id = ?
-        """,
-        (1 if won else 0, 0 if won else 1, rounds_played, 1 if eliminated else 0, score_delta, penalties, score_delta, user_id)
-    )
-    conn.commit()
-    conn.close()
+    with _db_lock:
+        # ensure row exists
+        if not _conn.execute(SQL_SELECT_USER, (user_id,)).fetchone():
+            # if somehow absent, just create
+            _conn.execute(SQL_INSERT_USER, (user_id, "", ""))
+        # update aggregated stats
+        _conn.execute(
+            SQL_UPDATE_STATS,
+            (1 if won else 0, 0 if won else 1, rounds_played, 1 if eliminated else 0, score_delta, penalties, score_delta, user_id)
+        )
+    invalidate_leaderboard_cache()
+
+def flush_game_stats(rows, group_id: Optional[int] = None):
+    """
+    Save end-of-match stats for all players in a single transaction.
+    rows: (user_id, first_name, username, score_delta, won, eliminated, rounds_played, penalties)
+    When group_id is given, the group's games_played is counted in the same transaction.
+    """
+    with _transaction() as conn:
+        if group_id is not None:
+            conn.execute(SQL_COUNT_GROUP_GAME, (group_id,))
+        conn.executemany(
+            SQL_INSERT_USER_IF_MISSING,
+            [(user_id, first_name, username) for user_id, first_name, username, *_ in rows]
+        )
+        conn.executemany(
+            SQL_UPDATE_STATS,
+            [
+                (1 if won else 0, 0 if won else 1, rounds_played, 1 if eliminated else 0,
+                 score_delta, penalties, score_delta, user_id)
+                for user_id, _, _, score_delta, won, eliminated, rounds_played, penalties in rows
+            ]
+        )
+    invalidate_leaderboard_cache()
 
 def ensure_columns_exist():
-        conn = sqlite3.connect(DB_PATH)
-        c = conn.cursor()
+        global _schema_checked
+        if _schema_checked:
+            return
         required_columns = {
             "games_played": "INTEGER DEFAULT 0",
             "wins": "INTEGER DEFAULT 0",
@@ -173,19 +273,75 @@ def ensure_columns_exist():
             "penalties": "INTEGER DEFAULT 0"
         }
 
-        c.execute("PRAGMA table_info(users)")
-        existing_columns = [col[1] for col in c.fetchall()]
+        with _db_lock:
+            existing_columns = [col[1] for col in _conn.execute("PRAGMA table_info(users)").fetchall()]
+
+            for col, col_type in required_columns.items():
+                if col not in existing_columns:
+                    _conn.execute(f"ALTER TABLE users ADD COLUMN {col} {col_type}")
+            # Backfill NULL counters once so readers don't need IFNULL() on every query
+            _conn.execute(
+                "UPDATE users SET "
+                + ", ".join(f"{col} = IFNULL({col}, 0)" for col in required_columns)
+                + " WHERE "
+                + " OR ".join(f"{col} IS NULL" for col in required_columns)
+            )
+            # Matches the leaderboard ORDER BY so the top rows come straight off the index
+            _conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_users_wins_score "
+                "ON users(IFNULL(wins, 0) DESC, IFNULL(total_score, 0) DESC)"
+            )
+            # Range scans for the "active in the last N days" counts in /gstats
+            _conn.execute("CREATE INDEX IF NOT EXISTS idx_users_updated_at ON users(updated_at)")
+            _schema_checked = True
+
 
-        for col, col_type in required_columns.items():
-            if col not in existing_columns:
-                c.execute(f"ALTER TABLE users ADD COLUMN {col} {col_type}")
+# Telegram file_ids for images the bot sends by URL, keyed by that URL. Once
+# one is known the photo goes out by file_id and Telegram skips re-fetching it.
+_file_ids: Dict[str, str] = {}
 
-        conn.commit()
-        conn.close()
+def init_file_cache():
+    """Create the file_cache table and load the stored file_ids."""
+    with _db_lock:
+        _conn.execute(
+            "CREATE TABLE IF NOT EXISTS file_cache (url TEXT PRIMARY KEY, file_id TEXT NOT NULL)"
+        )
+        _file_ids.update(_conn.execute("SELECT url, file_id FROM file_cache").fetchall())
 
+def save_file_id(url: str, file_id: str):
+    with _db_lock:
+        _conn.execute(
+            "INSERT OR REPLACE INTO file_cache (url, file_id) VALUES (?, ?)", (url, file_id)
+        )
+
+def restore_db(src_path: str, pages: int = -1):
+    """
+    Replace the live DB with the SQLite file at src_path. The pages go in
+    through the backup API on _conn, so the WAL and mmap stay consistent and
+    other connections see the restored data on their next read. Caches built
+    from the old data are dropped and the schema checks run again.
+    """
+    global _schema_ready, _schema_checked
+    src = sqlite3.connect(src_path)
+    try:
+        with _db_lock:
+            src.backup(_conn, pages=pages)
+            _schema_ready = _schema_checked = False
+            _file_ids.clear()
+            _init_schema()
+    finally:
+        src.close()
+    invalidate_leaderboard_cache()
+    _admin_cache.clear()
 
 # -------------------- GAME DATA CLASSES --------------------
 class Player:
+    __slots__ = (
+        "user_id", "name", "username", "current_number", "score", "eliminated",
+        "miss_offenses", "total_penalties", "rounds_played", "mention_html",
+        "timeout_count",
+    )
+
     def __init__(self, user_id: int, name: str, username: Optional[str] = None):
         self.user_id: int = user_id
         self.name: str = name
@@ -196,68 +352,209 @@ class Player:
         self.miss_offenses: int = 0                    # times player missed pick
         self.total_penalties: int = 0                  # total penalties accrued
         self.rounds_played: int = 0                    # number of rounds played
+        self.mention_html: str = f"<a href='tg://user?id={user_id}'>{name}</a>"  # cached HTML mention
+
+    def rename(self, name: str):
+        """Change the display name and refresh the cached mention."""
+        self.name = name
+        self.mention_html = f"<a href='tg://user?id={self.user_id}'>{name}</a>"
 
     def __repr__(self):
         return f"<Player {self.name} ({self.user_id}) score={self.score} eliminated={self.eliminated}>"
 
 # In the MindScaleGame class (replace the existing class definition)
 class MindScaleGame:
+    # The last five are set as the game progresses and read with getattr() defaults
+    __slots__ = (
+        "group_id", "players", "_active", "join_phase_active", "round_number",
+        "current_round_active", "pending_picks", "round_timer", "_bg_tasks",
+        "score_history", "join_timer_task", "duplicate_rule_sticky", "_next_round_sticky", "group_link",
+        "round_results_sent", "duplicate_rule_active", "next_round_duplicate_active",
+        "ended", "game_started",
+    )
+
     def __init__(self, group_id: int):
         self.group_id: int = group_id
         self.players: Dict[int, Player] = {}           # user_id -> Player
+        self._active: Dict[int, Player] = {}           # user_id -> Player not yet eliminated (join order)
         self.join_phase_active: bool = True
         self.round_number: int = 0
         self.current_round_active: bool = False
-        self.pick_tasks: Dict[int, asyncio.Task] = {}      # user_id -> asyncio.Task for pick timeout
-        self.pick_30_alerts: Dict[int, asyncio.Task] = {}  # user_id -> asyncio.Task for 30s alert
+        self.pending_picks: int = 0                     # active players still to pick this round
+        self.round_timer: Optional[asyncio.TimerHandle] = None  # the round's one timer: 30s alert, then pick timeout
+        self._bg_tasks: set = set()                         # strong refs to fire-and-forget tasks
         self.score_history: list = []                      # list of per-round results
         self.join_timer_task: Optional[asyncio.Task] = None # Track join phase timer task
         self.duplicate_rule_sticky: bool = False  # once triggered, stays on each round
         self._next_round_sticky: bool = False 
+        self.group_link: Optional[str] = None  # "Back to Game" URL; "" once known to be unavailable
 
 
     @property
     def active_players(self):
         """Return list of players who are not eliminated."""
-        return [p for p in self.players.values() if not p.eliminated]
+        return list(self._active.values())
 
     def add_player(self, user):
         """Add player to game."""
         if user.id not in self.players:
             p = Player(user.id, user.full_name, getattr(user, "username", None))
             self.players[user.id] = p
-            user_active_game[user.id] = self.group_id
+            self._active[user.id] = p
+            REGISTRY.add_player(self, user.id)
 
     def remove_player(self, user_id: int):
         """Remove player from game."""
         if user_id in self.players:
             del self.players[user_id]
-        user_active_game.pop(user_id, None)
+        self._active.pop(user_id, None)
+        REGISTRY.drop_player(user_id)
+
+    def eliminate(self, p: Player):
+        """Mark player as eliminated and drop them from the active set."""
+        p.eliminated = True
+        self._active.pop(p.user_id, None)
 
     def reset_round_picks(self):
         """Reset current picks for a new round."""
         for p in self.players.values():
             p.current_number = None
 
+    def spawn(self, coro) -> asyncio.Task:
+        """create_task() that keeps a reference until the task is done, so it can't be GC'd mid-run."""
+        task = asyncio.create_task(coro)
+        self._bg_tasks.add(task)
+        task.add_done_callback(self._bg_tasks.discard)
+        return task
+
+    async def cancel_background_tasks(self):
+        """Cancel every task started through spawn() and wait until each one has finished."""
+        current = asyncio.current_task()
+        pending = [t for t in self._bg_tasks if t is not current and not t.done()]
+        for t in pending:
+            t.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    def cancel_join_timer(self):
+        """Stop the join-phase scheduler, if it is still waiting."""
+        if self.join_timer_task is not None:
+            self.join_timer_task.cancel()  # no-op on a finished task
+            self.join_timer_task = None
+
+    def cancel_round_timer(self):
+        """Cancel the pending round timer handle (a no-op once it has fired)."""
+        if self.round_timer is not None:
+            self.round_timer.cancel()
+            self.round_timer = None
+
 # -------------------- HELPERS --------------------
 def mention_html(p: Player):
-    return f"<a href='tg://user?id={p.user_id}'>{p.name}</a>"
+    return p.mention_html
+
+# Per-chat outbox for lobby replies. join/leave/players queue a factory for
+# their reply and return; one worker per chat sends the replies in order and
+# waits out flood limits, so a rate-limited group doesn't stall the handlers.
+_OUTBOX_GAP = 0.05  # seconds between two sends to the same chat
+_outbox: Dict[int, asyncio.Queue] = {}
+_outbox_workers: Dict[int, asyncio.Task] = {}
+
+def send_later(chat_id: int, factory):
+    """Queue factory() (a coroutine function) for sending to chat_id."""
+    queue = _outbox.get(chat_id)
+    if queue is None:
+        queue = _outbox[chat_id] = asyncio.Queue()
+    queue.put_nowait(factory)
+    worker = _outbox_workers.get(chat_id)
+    if worker is None or worker.done():
+        _outbox_workers[chat_id] = asyncio.create_task(_drain_outbox(chat_id, queue))
+
+async def _drain_outbox(chat_id: int, queue: asyncio.Queue):
+    while not queue.empty():
+        factory = queue.get_nowait()
+        try:
+            try:
+                await factory()
+            except RetryAfter as e:
+                await asyncio.sleep(e.retry_after)
+                await factory()
+        except Exception as e:
+            logger.warning(f"Outbox send to {chat_id} failed: {e}")
+        await asyncio.sleep(_OUTBOX_GAP)
+    # Nothing can be queued between the empty() check and here, so it is safe to retire
+    _outbox.pop(chat_id, None)
+    _outbox_workers.pop(chat_id, None)
+
+async def flush_outbox(chat_id: int):
+    """Wait until everything queued for chat_id has been sent."""
+    worker = _outbox_workers.get(chat_id)
+    if worker is not None:
+        await asyncio.shield(worker)
+
+async def safe_send(bot, chat_id: int, text: str, **kwargs) -> Optional[Message]:
+    """send_message that waits out one flood limit and logs, instead of raising, any other failure."""
+    try:
+        try:
+            return await bot.send_message(chat_id=chat_id, text=text, **kwargs)
+        except RetryAfter as e:
+            await asyncio.sleep(e.retry_after)
+            return await bot.send_message(chat_id=chat_id, text=text, **kwargs)
+    except Exception as e:
+        logger.warning(f"Failed to send message to {chat_id}: {e}")
+        return None
+
+_ADMIN_TTL = 60  # seconds a get_chat_member result is trusted
+_admin_cache: Dict[tuple, tuple] = {}  # (chat_id, user_id) -> (status, expires_at)
+
+async def _is_admin(bot, chat_id: int, user_id: int) -> bool:
+    """Admin check with a short TTL cache; get_chat_member errors propagate to the caller."""
+    now = time.monotonic()
+    cached = _admin_cache.get((chat_id, user_id))
+    if cached and cached[1] > now:
+        status = cached[0]
+    else:
+        status = (await bot.get_chat_member(chat_id, user_id)).status
+        _admin_cache[(chat_id, user_id)] = (status, now + _ADMIN_TTL)
+    return status in ("administrator", "creator")
+
+def group_link_for(group_id: int, username: Optional[str]) -> str:
+    """t.me link back to a group, or "" when there is none."""
+    if username:  # Public group or supergroup with username
+        return f"https://t.me/{username}"
+    # Private supergroup: convert group_id to Telegram link format (remove -100 prefix)
+    chat_id_str = str(group_id)
+    if chat_id_str.startswith("-100"):
+        return f"https://t.me/c/{chat_id_str[4:]}"
+    return ""
+
+async def remember_file_id(url: str, msg):
+    """Store the file_id Telegram assigned to the photo in msg, sent from url, if it isn't known yet."""
+    if url in _file_ids or not isinstance(msg, Message) or not msg.photo:
+        return
+    _file_ids[url] = file_id = msg.photo[-1].file_id
+    try:
+        await run_db(save_file_id, url, file_id)
+    except Exception as e:
+        logger.warning(f"Could not store file_id for {url}: {e}")
+
+async def reply_photo_cached(message, url: str, **kwargs):
+    """reply_photo that sends by file_id once Telegram has handed one back for url."""
+    msg = await message.reply_photo(photo=_file_ids.get(url, url), **kwargs)
+    await remember_file_id(url, msg)
+    return msg
 
 def eval_duplicate_rule(game, picks):
 
-    counts = {}
-    for uid, num in picks:
-        counts[num] = counts.get(num, 0) + 1
+    counts = Counter(num for _, num in picks)
 
-    num_alive = len([p for p in game.players.values() if not p.eliminated])
-    num_eliminated = len([p for p in game.players.values() if p.eliminated])
+    num_alive = len(game.active_players)
+    num_eliminated = len(game.players) - num_alive
 
     if num_alive <= 2 and getattr(game, "duplicate_rule_sticky", False):
         game.duplicate_rule_sticky = False
 
-    triggered_sticky = False
-    if num_eliminated == 0 and any(c >= 4 for c in counts.values()):
-        triggered_sticky = True
+    # max() walks the counts in C; only the 4+ threshold matters here
+    triggered_sticky = num_eliminated == 0 and max(counts.values(), default=0) >= 4
 
     base_active_now = (num_alive > 2 and num_eliminated >= 1)
     sticky_active_now = getattr(game, "duplicate_rule_sticky", False)
@@ -268,6 +565,16 @@ def eval_duplicate_rule(game, picks):
     return apply_now, duplicate_nums, triggered_sticky, counts
 
 
+# Round texts and the DM button only depend on the round number / bot username
+_DIVIDER = "▭" * 14
+_DUPLICATE_RULE_NOTICE = "⚠️ Duplicate penalty rule is active this round! Picking the same number as 3 or more other players will result in a -1 point penalty."
+_ROUND_CAPTION = "𝗥𝗼𝘂𝗻𝗱 {round_no} \n🎲 Starting now! Send your number in DM!"
+_ROUND_DM = "🎯 𝗥𝗼𝘂𝗻𝗱 {round_no} \nSend a number between 0–100 ."
+
+@lru_cache(maxsize=4)
+def _dm_kb(bot_username: str) -> InlineKeyboardMarkup:
+    return InlineKeyboardMarkup([[InlineKeyboardButton("Send number in DM", url=f"https://t.me/{bot_username}")]])
+
 async def start_round(context: ContextTypes.DEFAULT_TYPE, group_id: int):
     if group_id not in active_games:
         return
@@ -280,156 +587,134 @@ async def start_round(context: ContextTypes.DEFAULT_TYPE, group_id: int):
     game.current_round_active = True
     game.round_number += 1
     game.reset_round_picks()
+    game.pending_picks = len(game.active_players)
     game.round_results_sent = False
 
-    # Cancel old tasks
-    for t in list(game.pick_tasks.values()) + list(game.pick_30_alerts.values()):
-        try:
-            t.cancel()
-        except:
-            pass
-    game.pick_tasks.clear()
-    game.pick_30_alerts.clear()
-
     # -------------------- Announce duplicate rule status --------------------
     if getattr(game, "duplicate_rule_active", False):
-        try:
-            await context.bot.send_message(
-                chat_id=group_id,
-                text="⚠️ Duplicate penalty rule is active this round! Picking the same number as 3 or more other players will result in a -1 point penalty.",
-                parse_mode="HTML"
-            )
-        except:
-            pass
+        await safe_send(
+            context.bot,
+            group_id,
+            _DUPLICATE_RULE_NOTICE,
+            parse_mode="HTML"
+        )
 
     # -------------------- Round start announcement --------------------
-    bot_username = (await context.bot.get_me()).username or ""
-    dm_url = f"https://t.me/{bot_username}"
-    buttons = InlineKeyboardMarkup([[InlineKeyboardButton("Send number in DM", url=dm_url)]])
-    try:
-        if VIDEO_ROUND_ANNOUNCE and VIDEO_ROUND_ANNOUNCE != "VIDEO_FILE_ID_ROUND":
+    buttons = _dm_kb(context.bot_data.get("bot_username", ""))
+    round_text = _ROUND_CAPTION.format(round_no=game.round_number)
+    announced = False
+    if VIDEO_ROUND_ANNOUNCE and VIDEO_ROUND_ANNOUNCE != "VIDEO_FILE_ID_ROUND":
+        try:
             await context.bot.send_video(
                 chat_id=group_id,
                 video=VIDEO_ROUND_ANNOUNCE,
-                caption=f"𝗥𝗼𝘂𝗻𝗱 {game.round_number} \n🎲 Starting now! Send your number in DM!",
-                reply_markup=buttons
-            )
-        else:
-            await context.bot.send_message(
-                chat_id=group_id,
-                text=f"𝗥𝗼𝘂𝗻𝗱 {game.round_number} \n🎲 Starting now! Send your number in DM!",
+                caption=round_text,
                 reply_markup=buttons
             )
-    except:
-        try:
-            await context.bot.send_message(
-                chat_id=group_id,
-                text=f"𝗥𝗼𝘂𝗻𝗱 {game.round_number} \n🎲 Starting now! Send your number in DM!",
-                reply_markup=buttons
-            )
-        except:
-            pass
+            announced = True
+        except Exception as e:
+            logger.warning(f"Failed to send round video for group {group_id}: {e}")
+    if not announced:
+        await safe_send(context.bot, group_id, round_text, reply_markup=buttons)
 
     # -------------------- Check active players --------------------
     players = game.active_players
     if not players:
-        try:
-            await context.bot.send_message(chat_id=group_id, text="❌ No active players. Ending game.")
-        except:
-            pass
+        await safe_send(context.bot, group_id, "❌ No active players. Ending game.")
         await end_game(context, group_id)
         return
 
-    # -------------------- Per-player DM and timers --------------------
-    async def handle_miss(user_id: int):
-        if group_id not in active_games or user_id not in game.players:
-            return
-        p = game.players.get(user_id)
-        if not p or p.eliminated or p.current_number is not None:
-            return
+    # -------------------- Send DMs (concurrently) --------------------
+    round_no = game.round_number
+    dm_text = _ROUND_DM.format(round_no=round_no)
+    targets = [p for p in players if not p.eliminated]
+    results = await asyncio.gather(
+        *(safe_send(context.bot, p.user_id, dm_text) for p in targets), return_exceptions=True
+    )
+    unreachable = [p for p, sent in zip(targets, results) if sent is None or isinstance(sent, BaseException)]
+    if unreachable:
+        await safe_send(
+            context.bot,
+            group_id,
+            "\n".join(f"⚠️ Could not DM {mention_html(p)}. Please open your DM with the bot." for p in unreachable),
+            parse_mode="HTML"
+        )
 
-        # ---------------- Penalty logic ----------------
-        if getattr(p, "timeout_count", 0) == 0:
-            p.score -= 1
-            p.total_penalties += 1
-            p.timeout_count = 1
-            p.current_number = "Skipped"
-            try:
-                await context.bot.send_message(
-                    chat_id=group_id,
-                    text=f"⚠️ {mention_html(p)} did not respond in time! -2 penalty.",
-                    parse_mode="HTML"
-                )
-            except:
-                pass
-        else:
-            p.eliminated = True
-            try:
-                await context.bot.send_message(
-                    chat_id=group_id,
-                    text=f"☠️ {mention_html(p)} failed again and is eliminated!",
-                    parse_mode="HTML"
-                )
-            except:
-                pass
+    # -------------------- Round timer (shared by all players) --------------------
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + PICK_TIME_SEC
+    game.cancel_round_timer()  # the previous round's timeout may not have fired yet
+    game.round_timer = loop.call_at(deadline - 30, fire_round_timer, context, game, game.round_number, deadline)
 
-        # Remove tasks
-        game.pick_tasks.pop(user_id, None)
-        game.pick_30_alerts.pop(user_id, None)
 
-        # Check if round can be processed
-        if group_id in active_games and all(pl.current_number is not None or pl.eliminated for pl in game.active_players):
-            game.current_round_active = False
-            await process_round_results(context, group_id)
+def round_is_current(game: MindScaleGame, round_no: int) -> bool:
+    """True while `round_no` is still the open round of a live game."""
+    return (
+        active_games.get(game.group_id) is game
+        and game.round_number == round_no
+        and game.current_round_active
+        and not getattr(game, "round_results_sent", False)
+    )
 
-    async def send_30_alert(user_id: int):
-        if group_id not in active_games or user_id not in game.players:
-            return
-        p = game.players.get(user_id)
-        if not p or p.eliminated or p.current_number is not None:
-            return
-        try:
-            await context.bot.send_message(
-                chat_id=group_id,
-                text=f"⏳ {mention_html(p)} — 30 seconds left to send your number in DM!",
-                parse_mode="HTML"
-            )
-        except:
-            pass
-
-    # -------------------- Send DMs and start timers --------------------
-    for p in players:
-        if p.eliminated:
-            continue
-        # DM instructions
-        try:
-            await context.bot.send_message(
-                chat_id=p.user_id,
-                text=f"🎯 𝗥𝗼𝘂𝗻𝗱 {game.round_number} \nSend a number between 0–100 ."
-            )
-        except:
-            try:
-                await context.bot.send_message(
-                    chat_id=group_id,
-                    text=f"⚠️ Could not DM {mention_html(p)}. Please open your DM with the bot.",
-                    parse_mode="HTML"
-                )
-            except:
-                pass
 
-        # 30-second alert
-        async def _alert(uid=p.user_id):
-            await asyncio.sleep(PICK_TIME_SEC - 30)
-            await send_30_alert(uid)
-        t30 = asyncio.create_task(_alert())
-        game.pick_30_alerts[p.user_id] = t30
+def fire_round_timer(context: ContextTypes.DEFAULT_TYPE, game: MindScaleGame, round_no: int, deadline: Optional[float] = None):
+    """
+    TimerHandle callback for the round's single timer. Given the pick
+    deadline it is the 30s alert and re-arms itself for that deadline;
+    without one it is the timeout. Does nothing once the round has closed.
+    """
+    if not round_is_current(game, round_no):
+        return
+    game.round_timer = None
+    if deadline is not None:
+        game.spawn(round_alert(context, game, round_no))
+        game.round_timer = asyncio.get_running_loop().call_at(deadline, fire_round_timer, context, game, round_no)
+    else:
+        game.spawn(round_timeout(context, game, round_no))
+
+
+async def round_alert(context: ContextTypes.DEFAULT_TYPE, game: MindScaleGame, round_no: int):
+    """Post one reminder for everyone who has not picked yet."""
+    waiting = [p for p in game.active_players if p.current_number is None]
+    if not waiting:
+        return
+    await safe_send(
+        context.bot,
+        game.group_id,
+        f"⏳ {', '.join(mention_html(p) for p in waiting)} — 30 seconds left to send your number in DM!",
+        parse_mode="HTML"
+    )
+
+
+async def round_timeout(context: ContextTypes.DEFAULT_TYPE, game: MindScaleGame, round_no: int):
+    """Resolve every missing pick at the deadline, then process the round."""
+    # The round may have been resolved by the last pick or ended by /endmatch
+    # since this timer fired; misses only apply to the round it was set for
+    if not round_is_current(game, round_no):
+        return
+    group_id = game.group_id
+    # Apply every miss before the first await so late DMs can't interleave
+    notices = [handle_miss(game, p) for p in game.active_players if p.current_number is None]
+    game.pending_picks -= len(notices)
+    if notices:
+        await safe_send(context.bot, group_id, "\n".join(notices), parse_mode="HTML")
+
+    # Check if round can be processed
+    if round_is_current(game, round_no) and game.pending_picks <= 0:
+        game.current_round_active = False
+        await process_round_results(context, group_id)
+
 
-        # Full timeout
-        async def _timeout(uid=p.user_id):
-            await asyncio.sleep(PICK_TIME_SEC)
-            await handle_miss(uid)
-        t_timeout = asyncio.create_task(_timeout())
-        game.pick_tasks[p.user_id] = t_timeout
+def handle_miss(game: MindScaleGame, p: Player) -> str:
+    """Apply the penalty for a missed pick and return the group notice."""
+    if getattr(p, "timeout_count", 0) == 0:
+        p.score -= 1
+        p.total_penalties += 1
+        p.timeout_count = 1
+        p.current_number = "Skipped"
+        return f"⚠️ {mention_html(p)} did not respond in time! -2 penalty."
+    game.eliminate(p)
+    return f"☠️ {mention_html(p)} failed again and is eliminated!"
 
 
 async def process_round_results(context: ContextTypes.DEFAULT_TYPE, group_id: int):
@@ -442,164 +727,138 @@ async def process_round_results(context: ContextTypes.DEFAULT_TYPE, group_id: in
         return
     game.round_results_sent = True
 
-    # Gather valid picks
-    picks = [(p.user_id, p.current_number) for p in game.active_players 
-             if isinstance(p.current_number, (int, float))]
-
-    if not picks:
-        try:
-            await context.bot.send_message(chat_id=group_id, text="❌ No valid picks received this round.")
-        except:
-            pass
+    # Partition players once; only the elimination check below changes this
+    alive_players, eliminated_players = [], []
+    for p in game.players.values():
+        (eliminated_players if p.eliminated else alive_players).append(p)
+
+    # -------------------- Pass 1: reveal text and valid picks --------------------
+    reveal_parts = ["𝗥𝗼𝘂𝗻𝗱 𝗣𝗶𝗰𝗸𝘀 \n\n"]
+    valid = []  # (player, number) in join order
+    total = 0
+    for p in alive_players:
+        n = p.current_number
+        reveal_parts.append(f"♦️ {mention_html(p)} → {n if n is not None else '⏳ Skipped'}\n")
+        if isinstance(n, (int, float)):
+            valid.append((p, n))
+            total += n
+    reveal_parts.append(_DIVIDER)
+
+    if not valid:
+        await safe_send(context.bot, group_id, "❌ No valid picks received this round.")
         await end_game(context, group_id)
         return
 
-    nums = [n for _, n in picks]
-    average = sum(nums) / len(nums)
-    target = average * 0.8
-
-    alive_players = [p for p in game.players.values() if not p.eliminated]
-
-    # -------------------- Reveal picks --------------------
-    reveal_text = "𝗥𝗼𝘂𝗻𝗱 𝗣𝗶𝗰𝗸𝘀 \n\n"
-    for p in game.active_players:
-        pick_val = p.current_number if p.current_number is not None else "⏳ Skipped"
-        reveal_text += f"♦️ {mention_html(p)} → {pick_val}\n"
-    reveal_text += "▭▭▭▭▭▭▭▭▭▭▭▭▭▭"
-    try:
-        await context.bot.send_message(chat_id=group_id, text=reveal_text, parse_mode="HTML")
-        async def reveal_delay():
-            await asyncio.sleep(2)
-        asyncio.create_task(reveal_delay())
-    except:
-        pass
-
-    # -------------------- Duplicate Penalty --------------------
-    apply_dup_now, duplicate_nums, sticky_next, counts = eval_duplicate_rule(game, picks)
-
-    duplicate_players = set()
-    duplicates_exist = False
+    picks = [(p.user_id, n) for p, n in valid]
+    target = total / len(valid) * 0.8
 
+    apply_dup_now, duplicate_nums, sticky_next, _ = eval_duplicate_rule(game, picks)
     # If sticky should start next round, remember it
     if sticky_next:
         game._next_round_sticky = True
 
-    if apply_dup_now and duplicate_nums:
-        duplicates_exist = True
-        for p in game.active_players:
-            if isinstance(p.current_number, (int, float)) and p.current_number in duplicate_nums:
-                p.score -= 1
-                p.total_penalties += 1
-                duplicate_players.add(p)
-                try:
-                    await context.bot.send_message(
-                        chat_id=group_id,
-                        text=f"⚠️ {mention_html(p)} picked a duplicate number ({p.current_number})! −1 penalty.",
-                        parse_mode="HTML"
-                    )
-                except:
-                    pass
-
-    # -------------------- Closest number logic --------------------
+    # -------------------- Pass 2: closest, duplicates, exact target, 0 vs 100 --------------------
     winner_players = []
-    diffs = [(p, abs(p.current_number - target)) for p in alive_players 
-             if isinstance(p.current_number, (int, float))]
-    if diffs:
-        min_diff = min(d for _, d in diffs)
-        winner_players = [p for p, d in diffs if d == min_diff and not p.eliminated]
-
-    # -------------------- Special case: 0 vs 100 --------------------
-    alive_now = [p for p in game.players.values() if not p.eliminated]
-    zero_vs_hundred_case = False
-    if len(alive_now) == 2:
-        vals = [p.current_number for p in alive_now if isinstance(p.current_number, (int, float))]
-        if 0 in vals and 100 in vals:
-            p100 = next(p for p in alive_now if p.current_number == 100)
-            winner_players = [p100]
-            zero_vs_hundred_case = True
-            for p in alive_now:
-                if p != p100 and p not in duplicate_players:
-                    p.score -= 1
-                    p.total_penalties += 1
-
-    # -------------------- Second elimination special penalty --------------------
-    special_penalty_applied = False
-    num_eliminated = len([p for p in game.players.values() if p.eliminated])
-    if num_eliminated >= 2 and not zero_vs_hundred_case and not duplicates_exist:
-        exact_target_players = [p for p in alive_players if p.current_number == round(target)]
-        if exact_target_players:
-            winner_players = exact_target_players
-            special_penalty_applied = True
-            for p in alive_players:
-                if p not in winner_players and p not in duplicate_players:
-                    p.score -= 2
-                    p.total_penalties += 2
-
-    # -------------------- Apply non-winner penalties --------------------
-    if not zero_vs_hundred_case:
-        for p in alive_players:
-            if p in duplicate_players:
-                continue  # duplicates already penalized
-            if p not in winner_players:
-                # Skip non-winner penalty if player already got -2 (timeout)
-                if getattr(p, "timeout_penalty_applied", False):
-                    continue
-                if duplicates_exist:
-                    continue  # non-duplicate players are safe when duplicates exist
-                if special_penalty_applied:
-                    continue
-                else:
-                    p.score -= 1
-                    p.total_penalties += 1
-
-    # -------------------- Elimination check --------------------
+    best_diff = math.inf
+    duplicate_players = []
+    exact_target_players = []
+    exact = round(target)
+    p100 = None
+    has_zero = False
+    for p, n in valid:
+        d = abs(n - target)
+        if d < best_diff:
+            best_diff = d
+            winner_players = [p]
+        elif d == best_diff:
+            winner_players.append(p)
+        if n in duplicate_nums:
+            duplicate_players.append(p)
+        if n == exact:
+            exact_target_players.append(p)
+        if n == 0:
+            has_zero = True
+        elif n == 100 and p100 is None:
+            p100 = p
+    duplicates_exist = apply_dup_now and bool(duplicate_nums)
+
+    # Exactly one scoring rule applies per round; each penalises a set of players:
+    #   duplicates      -> every duplicate picker -1, everyone else is safe
+    #   0 vs 100 (1v1)  -> the 100 wins, the other player -1
+    #   2+ eliminated   -> an exact hit on the rounded target wins, all others -2
+    #   otherwise       -> everyone but the closest -1
+    num_eliminated = len(eliminated_players)
+    if duplicates_exist:
+        losers, penalty = set(duplicate_players), 1
+    elif len(alive_players) == 2 and has_zero and p100 is not None:
+        winner_players = [p100]
+        losers, penalty = {p for p in alive_players if p is not p100}, 1
+    elif num_eliminated >= 2 and exact_target_players:
+        winner_players = exact_target_players
+        losers, penalty = {p for p in alive_players if p not in exact_target_players}, 2
+    else:
+        losers, penalty = {p for p in alive_players if p not in winner_players}, 1
+
+    # -------------------- Pass 3: apply penalties and eliminations --------------------
     eliminated_now = []
-    for p in list(game.players.values()):
-        if not p.eliminated and p.score <= -10:
-            p.eliminated = True
+    for p in alive_players:
+        if p in losers:
+            p.score -= penalty
+            p.total_penalties += penalty
+        if p.score <= -10:
+            game.eliminate(p)
             eliminated_now.append(p)
     # Activate duplicate rule for next round if first elimination occurs
     if eliminated_now and num_eliminated == 0:
         game.next_round_duplicate_active = True
 
     # -------------------- Round Results Announcement --------------------
-    res = f"𝗥𝗼𝘂𝗻𝗱 {game.round_number} 𝗥𝗲𝘀𝘂𝗹𝘁𝘀 \n\n"
-    res += f"🎯 Target: {target:.2f}\n\n"
+    # Reveal, duplicate penalties and results go out as one message
+    res_parts = [*reveal_parts, "\n\n"]
+    if duplicates_exist:
+        res_parts.extend(
+            f"⚠️ {mention_html(p)} picked a duplicate number ({p.current_number})! −1 penalty.\n"
+            for p in duplicate_players
+        )
+        res_parts.append("\n")
+    res_parts += [
+        f"𝗥𝗼𝘂𝗻𝗱 {game.round_number} 𝗥𝗲𝘀𝘂𝗹𝘁𝘀 \n\n",
+        f"🎯 Target: {target:.2f}\n\n",
+    ]
 
     if winner_players:
         winner_names = ", ".join([mention_html(p) for p in winner_players if not p.eliminated])
         if winner_names:
-            res += f"👑 Winner{'s' if len(winner_players) > 1 else ''}: {winner_names}\n\n"
+            res_parts.append(f"👑 Winner{'s' if len(winner_players) > 1 else ''}: {winner_names}\n\n")
 
-    res += "📊 Scores:\n"
+    res_parts.append("📊 Scores:\n")
     for p in sorted(game.players.values(), key=lambda x: -x.score):
         status = " (Eliminated)" if p.eliminated else ""
-        res += f"♦️ {mention_html(p)} — {p.score}{status}\n"
+        res_parts.append(f"♦️ {mention_html(p)} — {p.score}{status}\n")
 
-    res += " Keep pushing, the next round awaits! 🚀"
-    try:
-        await context.bot.send_message(chat_id=group_id, text=res, parse_mode="HTML")
+    res_parts.append(" Keep pushing, the next round awaits! 🚀")
+    res = "".join(res_parts)
+    if await safe_send(context.bot, group_id, res, parse_mode="HTML") is not None:
         async def results_delay():
             await asyncio.sleep(5)
-        asyncio.create_task(results_delay())
-    except:
-        pass
+        game.spawn(results_delay())
 
     # -------------------- Play elimination videos --------------------
-    for p in eliminated_now:
-        try:
-            await context.bot.send_video(
+    await asyncio.gather(
+        *(
+            context.bot.send_video(
                 chat_id=group_id,
                 video=VIDEO_ELIMINATION,
                 caption=f"☠️ {mention_html(p)} you are Eliminated!",
                 parse_mode="HTML"
             )
-        except:
-            pass
+            for p in eliminated_now
+        ),
+        return_exceptions=True
+    )
 
     # -------------------- End game if ≤1 left --------------------
-    alive_now = [p for p in game.players.values() if not p.eliminated]
-    if len(alive_now) <= 1:
+    if len(alive_players) - len(eliminated_now) <= 1:
         await end_game(context, group_id)
         return
 
@@ -610,20 +869,17 @@ async def process_round_results(context: ContextTypes.DEFAULT_TYPE, group_id: in
     if getattr(game, "_next_round_sticky", False):
         game.duplicate_rule_sticky = True
     game._next_round_sticky = False
-    for task in list(game.pick_tasks.values()) + list(game.pick_30_alerts.values()):
-        try:
-            task.cancel()
-        except:
-            pass
-    game.pick_tasks.clear()
-    game.pick_30_alerts.clear()
+    # Leftover round timers are not cancelled: they check the round number on wake-up
 
     # Update duplicate rule for next round
     game.duplicate_rule_active = getattr(game, "next_round_duplicate_active", False)
     game.next_round_duplicate_active = False  # Reset for the next round
 
     # Start next round (already backgrounded)
-    asyncio.create_task(start_round(context, group_id))
+    game.spawn(start_round(context, group_id))
+
+# Canonical spellings of every legal pick; anything else takes the slow path below
+_VALID_PICKS = {str(i): i for i in range(101)}
 
 async def dm_pick_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """
@@ -646,7 +902,7 @@ async def dm_pick_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text(
             "⚠️ The game you were in no longer exists."
         )
-        user_active_game.pop(user.id, None)
+        REGISTRY.drop_player(user.id)
         return
 
     game = active_games[group_id]
@@ -660,18 +916,24 @@ async def dm_pick_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     # Validate input
     text = (update.message.text or "").strip()
-    if not text.isdigit():
-        await update.message.reply_text(
-            "♦ Invalid input. Please send a **plain number between 0 and 100** "
-        )
-        return
+    num = _VALID_PICKS.get(text)
+    if num is None:
+        try:
+            # Plain ASCII digits only, as before: int() would also take "+5", "-0" and "1_0"
+            if not (text.isascii() and text.isdigit()):
+                raise ValueError(text)
+            num = int(text)
+        except ValueError:
+            await update.message.reply_text(
+                "♦ Invalid input. Please send a **plain number between 0 and 100** "
+            )
+            return
 
-    num = int(text)
-    if not 0 <= num <= 100:
-        await update.message.reply_text(
-            "⚠️ Your number must be between 0 and 100. Please try again."
-        )
-        return
+        if not 0 <= num <= 100:
+            await update.message.reply_text(
+                "⚠️ Your number must be between 0 and 100. Please try again."
+            )
+            return
 
     # Ensure player exists and is active
     if user.id not in game.players:
@@ -693,34 +955,31 @@ async def dm_pick_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
         )
         return
 
-    # Accept the pick
+    # Accept the pick. Whether it closes the round is decided now, before any
+    # await: the event loop is the lock, and by the time the reply below is
+    # sent the timeout may already have processed this round.
     player.current_number = num
+    game.pending_picks -= 1
+    round_no = game.round_number
+    last_pick = game.pending_picks <= 0
 
     # --- NEW: send DM reply with a button to go back to the group ---
-    group_link = None
-    try:
-        # Fetch chat information to determine if it's a public or private group
-        chat = await context.bot.get_chat(group_id)
-        if getattr(chat, "username", None):  # Public group or supergroup with username
-            group_link = f"https://t.me/{chat.username}"
-        else:  # Private group or supergroup
-            # Convert group_id to Telegram link format (remove -100 prefix)
-            chat_id_str = str(group_id)
-            if chat_id_str.startswith("-100"):
-                group_link = f"https://t.me/c/{chat_id_str[4:]}"
-    except Exception:
-        # Fallback if chat info cannot be retrieved
-        pass
+    # mode_selection normally fills it in; fetch it here only if that wasn't possible
+    group_link = game.group_link
+    if group_link is None:
+        try:
+            chat = await context.bot.get_chat(group_id)
+            group_link = game.group_link = group_link_for(group_id, getattr(chat, "username", None))
+        except Exception:
+            # Fallback if chat info cannot be retrieved; try again on the next pick
+            group_link = ""
 
     if group_link:
-        keyboard = InlineKeyboardMarkup(
-            [[InlineKeyboardButton("⬅️ Back to Game", url=group_link)]]
-        )
         await update.message.reply_text(
             f"♦ Number received: <b>{num}</b>\n"
             "🎯 Get ready for the next round!",
             parse_mode="HTML",
-            reply_markup=keyboard
+            reply_markup=_back_kb(group_link)
         )
     else:
         # Fallback if group link cannot be generated
@@ -730,28 +989,8 @@ async def dm_pick_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
             parse_mode="HTML"
         )
 
-    # Cancel any existing pick timeout or 30s alert
-    task = game.pick_tasks.pop(user.id, None)
-    if task and not task.done():
-        task.cancel()
-    task30 = game.pick_30_alerts.pop(user.id, None)
-    if task30 and not task30.done():
-        task30.cancel()
-
-    # If all players have picked, process results immediately
-    if all((pl.current_number is not None or getattr(pl, "eliminated", False)) for pl in game.players.values()):
-        # Cancel remaining per-player tasks safely
-        for t in list(game.pick_tasks.values()):
-            if t and not t.done():
-                t.cancel()
-        for t in list(game.pick_30_alerts.values()):
-            if t and not t.done():
-                t.cancel()
-
-        game.pick_tasks.clear()
-        game.pick_30_alerts.clear()
-
-        # Process round results immediately
+    # If this was the last pick of a round that is still open, process results immediately
+    if last_pick and round_is_current(game, round_no):
         await process_round_results(context, group_id)
 
 
@@ -771,56 +1010,32 @@ async def end_game(context: ContextTypes.DEFAULT_TYPE, group_id: int):
         return
     game.ended = True
 
-    # Ensure group exists in database and increment games_played
-    try:
-        conn = sqlite3.connect(DB_PATH)
-        c = conn.cursor()
-        c.execute("SELECT group_id FROM groups WHERE group_id = ?", (group_id,))
-        if not c.fetchone():
-            # If group doesn't exist, add it (title may be updated later)
-            c.execute(
-                "INSERT INTO groups (group_id, title, games_played) VALUES (?, ?, 0)",
-                (group_id, "Unknown Group")
-            )
-        c.execute(
-            "UPDATE groups SET games_played = games_played + 1 WHERE group_id = ?",
-            (group_id,)
-        )
-        conn.commit()
-    except Exception as e:
-        logger.error(f"Failed to update games_played for group {group_id}: {e}")
-    finally:
-        conn.close()
-
     # -------------------- Final Scoreboard (Nex Style) --------------------
     players_sorted = sorted(
         game.players.values(),
         key=lambda p: -getattr(p, "score", 0)
     ) if hasattr(game, "players") else []
 
-    text = "『 𝗙𝗶𝗻𝗮𝗹 𝗦𝗰𝗼𝗿𝗲𝗰𝗮𝗿𝗱 』\n"
-    text += "🎖️ Top Scorers:\n"
+    parts = ["『 𝗙𝗶𝗻𝗮𝗹 𝗦𝗰𝗼𝗿𝗲𝗰𝗮𝗿𝗱 』\n", "🎖️ Top Scorers:\n"]
 
     if not players_sorted:
-        text += "No players participated.\n"
+        parts.append("No players participated.\n")
     else:
         for p in players_sorted:
-            name = getattr(p, "name", "Unknown")
-            user_id = getattr(p, "user_id", None)
             score = getattr(p, "score", 0)
             status = " (Out)" if getattr(p, "eliminated", False) else ""
-            text += f"♦️  <a href='tg://user?id={user_id}'>{name}</a> — {score}  {status}\n"
+            parts.append(f"♦️  {mention_html(p)} — {score}  {status}\n")
 
-    text += "\n⊱⋅ ──────────────── ⋅⊰\n\n"
+    parts.append("\n⊱⋅ ──────────────── ⋅⊰\n\n")
 
     # -------------------- Winner Announcement --------------------
     winners = [p for p in players_sorted if not getattr(p, "eliminated", False)]
     winner = winners[0] if winners else (players_sorted[0] if players_sorted else None)
 
     if winner:
-        winner_name = getattr(winner, "name", "Unknown")
-        winner_id = getattr(winner, "user_id", None)
-        text += f"🎉 Champion: <a href='tg://user?id={winner_id}'>{winner_name}</a> 🏆\n"
+        winner_mention = mention_html(winner)
+        parts.append(f"🎉 Champion: {winner_mention} 🏆\n")
+    text = "".join(parts)
 
     # -------------------- Send Messages with 1-Second Delays --------------------
     async def send_scorecard():
@@ -835,7 +1050,7 @@ async def end_game(context: ContextTypes.DEFAULT_TYPE, group_id: int):
                 await context.bot.send_video(
                     chat_id=group_id,
                     video=VIDEO_WINNER,
-                    caption=f"🎉 Champion: <a href='tg://user?id={winner_id}'>{winner_name}</a> 🏆",
+                    caption=f"🎉 Champion: {winner_mention} 🏆",
                     parse_mode="HTML"
                 )
             except Exception as e:
@@ -843,7 +1058,7 @@ async def end_game(context: ContextTypes.DEFAULT_TYPE, group_id: int):
                 try:
                     await context.bot.send_message(
                         chat_id=group_id,
-                        text=f"🎉 Champion: <a href='tg://user?id={winner_id}'>{winner_name}</a> 🏆",
+                        text=f"🎉 Champion: {winner_mention} 🏆",
                         parse_mode="HTML"
                     )
                 except Exception as e:
@@ -852,7 +1067,7 @@ async def end_game(context: ContextTypes.DEFAULT_TYPE, group_id: int):
             try:
                 await context.bot.send_message(
                     chat_id=group_id,
-                    text=f"🎉 Champion: <a href='tg://user?id={winner_id}'>{winner_name}</a> 🏆",
+                    text=f"🎉 Champion: {winner_mention} 🏆",
                     parse_mode="HTML"
                 )
             except Exception as e:
@@ -868,61 +1083,69 @@ async def end_game(context: ContextTypes.DEFAULT_TYPE, group_id: int):
         except Exception as e:
             logger.error(f"Failed to send new game notification for group {group_id}: {e}")
 
-    # Schedule messages as background tasks with 1-second delays using call_later
-    loop = asyncio.get_event_loop()
-    loop.call_later(0, lambda: asyncio.create_task(send_scorecard()))
-    loop.call_later(1, lambda: asyncio.create_task(send_winner_announcement()))
-    loop.call_later(2, lambda: asyncio.create_task(send_new_game_notification()))
+    # One background task sends all three, a second apart, instead of a timer and task per message
+    async def announce():
+        await send_scorecard()
+        await asyncio.sleep(1)
+        await send_winner_announcement()
+        await asyncio.sleep(1)
+        await send_new_game_notification()
 
-    # -------------------- Save User Stats --------------------
-    for p in players_sorted:
-        try:
-            user_obj = type("U", (), {
-                "id": getattr(p, "user_id", None),
-                "first_name": getattr(p, "name", "Unknown"),
-                "username": getattr(p, "username", None)
-            })
-            ensure_user_exists(user_obj)
-            update_user_after_game(
-                user_id=getattr(p, "user_id", None),
-                score_delta=getattr(p, "score", 0),
-                won=(winner is not None and getattr(p, "user_id", None) == getattr(winner, "user_id", None)),
-                eliminated=getattr(p, "eliminated", False),
-                rounds_played=getattr(p, "rounds_played", 0),
-                penalties=getattr(p, "total_penalties", 0)
-            )
-        except Exception as e:
-            logger.error(f"Failed to update stats for user {getattr(p, 'user_id', 'unknown')}: {e}")
-            continue
+    game.spawn(announce())
 
     # -------------------- Clean Active Game Data --------------------
-    for p in players_sorted:
-        user_active_game.pop(getattr(p, "user_id", None), None)
+    # Detached before the stats write awaits, so an /endmatch confirm landing
+    # meanwhile finds no game and can't save the match a second time
+    REGISTRY.drop_game(group_id)
+
+    # Cancel the pending round timer
+    game.cancel_round_timer()
+
+    # -------------------- Save User Stats and Group games_played --------------------
+    winner_id = winner.user_id if winner else None
+    rows = [
+        (p.user_id, p.name, p.username, p.score, p.user_id == winner_id,
+         p.eliminated, p.rounds_played, p.total_penalties)
+        for p in players_sorted
+    ]
+    try:
+        await run_db(flush_game_stats, rows, group_id)
+    except Exception as e:
+        logger.error(f"Failed to update stats for group {group_id}: {e}")
+    logger.debug(f"Game ended and cleaned up for group {group_id}")
 
-    # Cancel pending async tasks safely
-    for t in list(getattr(game, "pick_tasks", {}).values()):
-        try:
-            if t and not t.done():
-                t.cancel()
-        except Exception as e:
-            logger.error(f"Failed to cancel pick task for group {group_id}: {e}")
-    for t in list(getattr(game, "pick_30_alerts", {}).values()):
-        try:
-            if t and not t.done():
-                t.cancel()
-        except Exception as e:
-            logger.error(f"Failed to cancel pick_30_alerts task for group {group_id}: {e}")
 
-    # Clear task references
-    getattr(game, "pick_tasks", {}).clear()
-    getattr(game, "pick_30_alerts", {}).clear()
+# -------------------- LOBBY HANDLERS (start/join/leave/players/endmatch) --------------------
+# Keyboards never change once built, so they are shared instead of rebuilt per message.
+_LOBBY_PHOTO_URL = "https://graph.org/file/79186f4d926011e1fb8e8-a9c682050a7a3539ed.jpg"
+_WELCOME_SUPPORT_KB = InlineKeyboardMarkup([[InlineKeyboardButton("🛠 Support", url="https://t.me/MindScale17")]])
+_SUPPORT_KB = InlineKeyboardMarkup([[InlineKeyboardButton("💠 Support", url="https://t.me/MindScale17")]])
+
+@lru_cache(maxsize=512)
+def _mode_kb(group_id: int) -> InlineKeyboardMarkup:
+    return InlineKeyboardMarkup([
+        [
+            InlineKeyboardButton("Solo", callback_data=f"start_solo:{group_id}"),
+            InlineKeyboardButton("Team", callback_data=f"start_team:{group_id}")
+        ]
+    ])
 
-    # Remove game from active_games
-    active_games.pop(group_id, None)
-    logger.debug(f"Game ended and cleaned up for group {group_id}")
+@lru_cache(maxsize=512)
+def _solo_kb(group_id: int) -> InlineKeyboardMarkup:
+    return InlineKeyboardMarkup([
+        [InlineKeyboardButton("Play Solo", callback_data=f"start_solo:{group_id}")]
+    ])
 
+@lru_cache(maxsize=512)
+def _back_kb(group_link: str) -> InlineKeyboardMarkup:
+    return InlineKeyboardMarkup([[InlineKeyboardButton("⬅️ Back to Game", url=group_link)]])
+
+@lru_cache(maxsize=512)
+def _end_kb(group_id: int) -> InlineKeyboardMarkup:
+    return InlineKeyboardMarkup([
+        [InlineKeyboardButton("✅ Confirm End Match", callback_data=f"confirm_endmatch:{group_id}")]
+    ])
 
-# -------------------- LOBBY HANDLERS (start/join/leave/players/endmatch) --------------------
 async def startgame(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if update.effective_chat.type == 'private':
         await update.message.reply_text("❌ /startgame can only be used in groups!")
@@ -933,16 +1156,11 @@ async def startgame(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return
 
     # Send photo with mode selection buttons
-    buttons = InlineKeyboardMarkup([
-        [
-            InlineKeyboardButton("Solo", callback_data=f"start_solo:{group_id}"),
-            InlineKeyboardButton("Team", callback_data=f"start_team:{group_id}")
-        ]
-    ])
-    await update.message.reply_photo(
-        photo="https://graph.org/file/79186f4d926011e1fb8e8-a9c682050a7a3539ed.jpg",
+    await reply_photo_cached(
+        update.message,
+        _LOBBY_PHOTO_URL,
         caption="🎲 Mind Scale Game\n\nChoose game mode:",
-        reply_markup=buttons
+        reply_markup=_mode_kb(group_id)
     )
 
 # -------------------- MODE SELECTION HANDLER --------------------
@@ -962,64 +1180,80 @@ async def mode_selection(update: Update, context: ContextTypes.DEFAULT_TYPE):
             )
             return
         game = MindScaleGame(group_id)
-        active_games[group_id] = game
+        # The button's message is in the group, so its chat gives the link without a get_chat() call
+        chat = query.message.chat if query.message else None
+        if chat is not None and chat.id == group_id:
+            game.group_link = group_link_for(group_id, chat.username)
+        REGISTRY.add_game(game)
         welcome_text = f"""🎲 Mind Scale Game Starting (Solo Mode) 🎲
 
 Use /join to join the current game
 Use /leave to leave before the {JOIN_TIME_SEC // 60}-min timer ends
 
 Minimum players: {MIN_PLAYERS}"""
-        buttons = InlineKeyboardMarkup([[InlineKeyboardButton("🛠 Support", url="https://t.me/MindScale17")]])
         await query.edit_message_caption(
             caption=welcome_text,
-            reply_markup=buttons
+            reply_markup=_WELCOME_SUPPORT_KB
         )
         # Start join timer task (non-blocking)
-        asyncio.create_task(join_phase_scheduler(context, group_id))
+        game.join_timer_task = game.spawn(join_phase_scheduler(context, group_id))
 
     elif mode == "start_team":
         await query.edit_message_caption(
             caption="🚀 Team Mode is coming soon! Try Solo Mode for now.",
-            reply_markup=InlineKeyboardMarkup([
-                [InlineKeyboardButton("Play Solo", callback_data=f"start_solo:{group_id}")]
-            ])
+            reply_markup=_solo_kb(group_id)
         )
 
-# Modify join_phase_scheduler to store the task in the game object
 async def join_phase_scheduler(context: ContextTypes.DEFAULT_TYPE, group_id: int):
-    """Schedule 60s/30s/10s alerts AND join end, non-blocking."""
+    """
+    Send the 60s/30s/10s alerts and end the join phase from one task (game.join_timer_task).
+
+    The alerts are awaited inline rather than spawned, so the task has no
+    children: cancelling it from /join, /forcestart or /endgame stops
+    everything at once and leaves nothing to clean up.
+    """
     if group_id not in active_games:
         return
     game = active_games[group_id]
+    loop = asyncio.get_running_loop()
+    join_ends_at = loop.time() + JOIN_TIME_SEC
+
+    def join_open():
+        return active_games.get(group_id) is game and game.join_phase_active
 
-    # Schedule alerts in parallel
-    async def schedule_alert(delay, seconds_left):
-        await asyncio.sleep(delay)
-        if group_id in active_games and active_games[group_id].join_phase_active:
+    for seconds_left in (60, 30, 10):
+        delay = join_ends_at - loop.time() - seconds_left
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if not join_open():
+            return
+        try:
             await context.bot.send_message(chat_id=group_id, text=f"⏱ Hurry up! Only {seconds_left} seconds left to /join the game!")
+        except Exception as e:
+            logger.warning(f"Failed to send join alert for group {group_id}: {e}")
 
-    tasks = []
-    for sec in [60, 30, 10]:
-        delay = max(0, JOIN_TIME_SEC - sec)
-        tasks.append(asyncio.create_task(schedule_alert(delay, sec)))
+    remaining = join_ends_at - loop.time()
+    if remaining > 0:
+        await asyncio.sleep(remaining)
 
-    # Store the join timer task
-    game.join_timer_task = asyncio.create_task(asyncio.sleep(JOIN_TIME_SEC))
+    # End join phase, unless /forcestart or a full lobby already closed it
+    if join_open():
+        game.join_timer_task = None  # the game runs on from here; nothing may cancel this task now
+        await end_join_phase(context, group_id)
 
-    # Wait for full join period
-    try:
-        await game.join_timer_task
-    except asyncio.CancelledError:
-        pass  # Handle cancellation gracefully
 
-    # End join phase
-    if group_id in active_games:
-        await end_join_phase(context, group_id)
+_JOIN_FAIL = (
+    "❌  𝗝𝗼𝗶𝗻 𝗣𝗵𝗮𝘀𝗲 𝗘𝗻𝗱𝗲𝗱』\n\n"
+    "🚫 Not enough players joined ({joined}/5).\n"
+    "The game has been canceled."
+)
+_LOBBY_OVERFLOW = "⚠️ Sorry! The match can only have 7 players. You won't be playing this round."
+_MATCH_SETTLED_HEAD = "『 𝗠𝗮𝘁𝗰𝗵 𝗦𝗲𝘁𝘁𝗹𝗲𝗱 』\n\n🎲 Players Joined ({joined}):\n"
+_MATCH_SETTLED_TAIL = (
+    "\n\n⊱⋅ ─────────── ⋅⊰\n\n"
+    "✧ Brace yourselves! The game is about to begin! 🚀"
+)
 
-    # Cleanup
-    for t in tasks:
-        if not t.done():
-            t.cancel()
 async def end_join_phase(context: ContextTypes.DEFAULT_TYPE, group_id: int):
     if group_id not in active_games:
         return
@@ -1033,42 +1267,35 @@ async def end_join_phase(context: ContextTypes.DEFAULT_TYPE, group_id: int):
     if num_joined < 5:  # MIN_PLAYERS
         await context.bot.send_message(
             chat_id=group_id,
-            text=f"❌  𝗝𝗼𝗶𝗻 𝗣𝗵𝗮𝘀𝗲 𝗘𝗻𝗱𝗲𝗱』\n\n"
-                 f"🚫 Not enough players joined ({num_joined}/5).\n"
-                 f"The game has been canceled.",
+            text=_JOIN_FAIL.format(joined=num_joined),
             parse_mode="HTML"
         )
-        for p in game.players.values():
-            user_active_game.pop(p.user_id, None)
-        del active_games[group_id]
+        REGISTRY.drop_game(group_id)
         return
 
     # If more than MAX_PLAYERS, take only first 7
     if num_joined > 7:
-        joined_players = list(game.players.values())[:7]
-        removed_players = list(game.players.values())[7:]
-        game.players = {p.user_id: p for p in joined_players}
+        removed_players = list(islice(game.players.values(), 7, None))
+        for p in removed_players:
+            game.remove_player(p.user_id)
 
         # Inform removed players
-        for p in removed_players:
-            await context.bot.send_message(
-                chat_id=p.user_id,
-                text="⚠️ Sorry! The match can only have 7 players. You won't be playing this round.",
-            )
+        await asyncio.gather(
+            *(
+                context.bot.send_message(
+                    chat_id=p.user_id,
+                    text=_LOBBY_OVERFLOW,
+                )
+                for p in removed_players
+            ),
+            return_exceptions=True
+        )
 
-    players_list = "\n".join(
-        [f"♦️ <a href='tg://user?id={p.user_id}'>{p.name}</a>" for p in game.players.values()]
-    )
+    players_list = "\n".join([f"♦️ {mention_html(p)}" for p in game.players.values()])
 
     await context.bot.send_message(
         chat_id=group_id,
-        text=(
-            f"『 𝗠𝗮𝘁𝗰𝗵 𝗦𝗲𝘁𝘁𝗹𝗲𝗱 』\n\n"
-            f"🎲 Players Joined ({len(game.players)}):\n"
-            f"{players_list}\n\n"
-            f"⊱⋅ ─────────── ⋅⊰\n\n"
-            f"✧ Brace yourselves! The game is about to begin! 🚀"
-        ),
+        text=_MATCH_SETTLED_HEAD.format(joined=len(game.players)) + players_list + _MATCH_SETTLED_TAIL,
         parse_mode="HTML"
     )
 
@@ -1077,70 +1304,70 @@ async def end_join_phase(context: ContextTypes.DEFAULT_TYPE, group_id: int):
 
 # ---------------- JOIN ----------------
 async def join(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    group_id = update.effective_chat.id
     if update.effective_chat.type == "private":
-        await update.message.reply_text(
+        send_later(group_id, lambda: update.message.reply_text(
             "⚠️ 𝗝𝗼𝗶𝗻 𝗚𝗮𝗺𝗲 \n\n❌ Use /join in the group where the game is running."
-        )
+        ))
         return
 
-    group_id = update.effective_chat.id
     user = update.effective_user
 
     # Check if user is already in a game
     if user.id in user_active_game:
         gid = user_active_game[user.id]
-        await update.message.reply_text(
+        send_later(group_id, lambda: update.message.reply_text(
             f" ⚠️ 𝗝𝗼𝗶𝗻 𝗚𝗮𝗺𝗲 \n\n❌ You are already playing in another group (`{gid}`). Finish it first!",
             parse_mode="Markdown"
-        )
+        ))
         return
 
     # Check if a game exists in this group
     if group_id not in active_games:
-        await update.message.reply_text(
+        send_later(group_id, lambda: update.message.reply_text(
             " ⚠️ 𝗝𝗼𝗶𝗻 𝗚𝗮𝗺𝗲 \n\n❌ No active game. Start one with /startgame"
-        )
+        ))
         return
 
     game = active_games[group_id]
 
     # Check if join phase is active
     if not getattr(game, "join_phase_active", False):
-        await update.message.reply_text(
+        send_later(group_id, lambda: update.message.reply_text(
             " ⚠️ 𝗝𝗼𝗶𝗻 𝗚𝗮𝗺𝗲 \n\n❌ Join phase is already closed!"
-        )
+        ))
         return
 
     # Check if max players reached
     if len(getattr(game, "players", [])) >= MAX_PLAYERS:
-        await update.message.reply_text(
+        send_later(group_id, lambda: update.message.reply_text(
             f"⚠️ 𝗝𝗼𝗶𝗻 𝗚𝗮𝗺𝗲 \n\n❌ The game already has {MAX_PLAYERS} players. Cannot join."
-        )
+        ))
         return
 
-    # Ensure user exists in stats
-    ensure_user_exists(user)
-
     # Add player to game
     game.add_player(user)
 
-    await update.message.reply_text(
+    send_later(group_id, lambda: update.message.reply_text(
         f" ✅ 𝗝𝗼𝗶𝗻 𝗚𝗮𝗺𝗲 \n\n✨ <b>{user.full_name}</b> joined the match!",
         parse_mode="HTML"
-    )
+    ))
+
+    # Ensure user exists in stats
+    await run_db(ensure_user_exists, user)
 
     # ---------------- START IMMEDIATELY WHEN FULL ----------------
-    if len(game.players) == MAX_PLAYERS:
+    # Re-checked after the DB write: the join timer may have closed the lobby meanwhile
+    if active_games.get(group_id) is game and game.join_phase_active and len(game.players) == MAX_PLAYERS:
         # Cancel join timer if still running
-        join_timer = getattr(game, "join_timer_task", None)
-        if join_timer and not join_timer.done():
-            join_timer.cancel()
-            game.join_timer_task = None
+        game.cancel_join_timer()
 
         # Mark join phase ended and start the game immediately
         game.join_phase_active = False
         game.game_started = True
 
+        # Let the queued join replies go out before the match messages
+        await flush_outbox(group_id)
         await context.bot.send_message(
             chat_id=group_id,
             text=f" 🚀 𝗠𝗮𝘁𝗰𝗵 𝗦𝘁𝗮𝗿𝘁 \n\n✅ {MAX_PLAYERS} players joined! Starting immediately..."
@@ -1149,77 +1376,73 @@ async def join(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 # ---------------- LEAVE ----------------
 async def leave(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    group_id = update.effective_chat.id
     if update.effective_chat.type == "private":
-        await update.message.reply_text(
+        send_later(group_id, lambda: update.message.reply_text(
             " ⚠️ 𝗟𝗲𝗮𝘃𝗲 𝗚𝗮𝗺𝗲\n\n❌ Use /leave in the group."
-        )
+        ))
         return
 
-    group_id = update.effective_chat.id
     user_id = update.effective_user.id
 
     if group_id not in active_games:
-        await update.message.reply_text(
+        send_later(group_id, lambda: update.message.reply_text(
             "⚠️ 𝗟𝗲𝗮𝘃𝗲 𝗚𝗮𝗺𝗲 \n\n❌ No active game."
-        )
+        ))
         return
 
     game = active_games[group_id]
 
     if not game.join_phase_active:
-        await update.message.reply_text(
+        send_later(group_id, lambda: update.message.reply_text(
             "⚠️ 𝗟𝗲𝗮𝘃𝗲 𝗚𝗮𝗺𝗲 \n\n❌ You cannot leave after the match has started."
-        )
+        ))
         return
 
     if user_id not in game.players:
-        await update.message.reply_text(
+        send_later(group_id, lambda: update.message.reply_text(
             " ⚠️ 𝗟𝗲𝗮𝘃𝗲 𝗚𝗮𝗺𝗲\n\n❌ You are not part of this game."
-        )
+        ))
         return
 
     game.remove_player(user_id)
 
-    await update.message.reply_text(
+    send_later(group_id, lambda: update.message.reply_text(
         f" 👋 𝗟𝗲𝗮𝘃𝗲 𝗚𝗮𝗺𝗲 \n\n🚪 <b>{update.effective_user.full_name}</b> has left the match.",
         parse_mode="HTML"
-    )
+    ))
 
 # ---------------- PLAYERS LIST ----------------
 async def players(update: Update, context: ContextTypes.DEFAULT_TYPE):
     group_id = update.effective_chat.id
     if group_id not in active_games:
-        await update.message.reply_text(
+        send_later(group_id, lambda: update.message.reply_text(
             "『 ⚠️ 𝗣𝗹𝗮𝘆𝗲𝗿𝘀 𝗟𝗶𝘀𝘁 』\n\n❌ No active game found."
-        )
+        ))
         return
 
     game = active_games[group_id]
     if not game.players:
-        await update.message.reply_text(
+        send_later(group_id, lambda: update.message.reply_text(
             "『 ⚠️ 𝗣𝗹𝗮𝘆𝗲𝗿𝘀 �_L𝗶𝘀𝘁 』\n\n❌ No players joined yet."
-        )
+        ))
         return
 
     # Build player list
-    text = " 🎲 𝗖𝘂𝗿𝗿𝗲𝗻𝘁 𝗣𝗹𝗮𝘆𝗲𝗿𝘀 🎲 \n\n"
-    for i, p in enumerate(game.players.values(), 1):
-        text += f"{i}. <a href='tg://user?id={p.user_id}'>{p.name}</a>\n"
-
-    text += "\n⊱⋅ ───────────── ⋅⊰\n"
-    text += "✧ Together we play, together we conquer! ⚡\n"
-
-    # Support button
-    buttons = InlineKeyboardMarkup([
-        [InlineKeyboardButton("💠 Support", url="https://t.me/MindScale17")]
-    ])
-
-    await update.message.reply_photo(
-        photo="https://graph.org/file/79186f4d926011e1fb8e8-a9c682050a7a3539ed.jpg",
+    text = "".join((
+        " 🎲 𝗖𝘂𝗿𝗿𝗲𝗻𝘁 𝗣𝗹𝗮𝘆𝗲𝗿𝘀 🎲 \n\n",
+        *(f"{i}. {mention_html(p)}\n" for i, p in enumerate(game.players.values(), 1)),
+        "\n⊱⋅ ───────────── ⋅⊰\n",
+        "✧ Together we play, together we conquer! ⚡\n",
+    ))
+
+    send_later(group_id, lambda: reply_photo_cached(
+        update.message,
+        _LOBBY_PHOTO_URL,
         caption=text,
         parse_mode="HTML",
-        reply_markup=buttons
-    )
+        reply_markup=_SUPPORT_KB
+    ))
 
 # ---------------- END MATCH ----------------
 async def endmatch(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -1234,25 +1457,22 @@ async def endmatch(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     # Admin check
     try:
-        member = await context.bot.get_chat_member(chat.id, user.id)
+        is_admin = await _is_admin(context.bot, chat.id, user.id)
     except:
         await update.message.reply_text(
             " ⚠️ 𝗘𝗻𝗱 𝗠𝗮𝘁𝗰𝗵 \n\n❌ Could not verify admin status."
         )
         return
 
-    if member.status not in ["administrator", "creator"]:
+    if not is_admin:
         await update.message.reply_text(
             " ⚠️ 𝗘𝗻𝗱 𝗠𝗮𝘁𝗰𝗵\n\n❌ Only group admins can end the match."
         )
         return
 
-    buttons = InlineKeyboardMarkup([
-        [InlineKeyboardButton("✅ Confirm End Match", callback_data=f"confirm_endmatch:{chat.id}")]
-    ])
     await update.message.reply_text(
         " ⚠️ 𝗘𝗻𝗱 𝗠𝗮𝘁𝗰𝗵 \n\n⚠️ Are you sure you want to end the current game?",
-        reply_markup=buttons
+        reply_markup=_end_kb(chat.id)
     )
 
 # ---------------- CONFIRM END MATCH ----------------
@@ -1269,61 +1489,49 @@ async def confirm_endmatch(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     # ---------------- ADMIN CHECK ----------------
     try:
-        member = await context.bot.get_chat_member(group_id, user.id)
+        is_admin = await _is_admin(context.bot, group_id, user.id)
     except:
         await query.edit_message_text(
             " ⚠️ 𝗘𝗻𝗱 𝗠𝗮𝘁𝗰𝗵 \n\n❌ Could not verify admin."
         )
         return
 
-    if member.status not in ["administrator", "creator"]:
+    if not is_admin:
         await query.edit_message_text(
             " ⚠️ 𝗘𝗻𝗱 𝗠𝗮𝘁𝗰𝗵』\n\n❌ Only admins can confirm this action."
         )
         return
 
     # ---------------- ACTIVE GAME CHECK ----------------
-    if group_id not in active_games:
+    # A game end_game is already finishing has its stats saved there
+    game = active_games.get(group_id)
+    if game is None or getattr(game, "ended", False):
         await query.edit_message_text(
             " ⚠️ 𝗘𝗻𝗱 𝗠𝗮𝘁𝗰𝗵 \n\n❌ No active game to end."
         )
         return
 
-    game = active_games[group_id]
+    # ---------------- REMOVE GAME AND ITS PLAYERS ----------------
+    # Removed before the stats write so a second confirm finds no game; the
+    # ended flag set here keeps an end_game that starts meanwhile from saving it again
+    game.ended = True
+    REGISTRY.drop_game(group_id)
 
-    # ---------------- CANCEL PLAYER TIMERS ----------------
-    for task in list(game.pick_tasks.values()) + list(game.pick_30_alerts.values()):
-        if not task.done():
-            task.cancel()
-    game.pick_tasks.clear()
-    game.pick_30_alerts.clear()
+    # ---------------- CANCEL TIMERS AND TASKS ----------------
+    # The game is already detached, so a task that outlives its cancellation finds nothing to act on
+    game.cancel_round_timer()
+    await game.cancel_background_tasks()
 
     # ---------------- SAVE USER STATS ----------------
-    for p in game.players.values():
-        class UserObj:
-            def __init__(self, user_id, name, username):
-                self.id = user_id
-                self.first_name = name
-                self.username = username
-
-        u = UserObj(p.user_id, p.name, p.username)
-        ensure_user_exists(u)
-
-        update_user_after_game(
-            user_id=p.user_id,
-            score_delta=getattr(p, "total_score", p.score),
-            rounds_played=getattr(p, "rounds_played", 0),
-            eliminated=getattr(p, "eliminated", False),
-            penalties=getattr(p, "total_penalties", 0),
-            won=False
-        )
-
-    # ---------------- CLEAR USER REFERENCES ----------------
-    for p in game.players.values():
-        user_active_game.pop(p.user_id, None)
-
-    # ---------------- REMOVE GAME ----------------
-    del active_games[group_id]
+    rows = [
+        (p.user_id, p.name, p.username, getattr(p, "total_score", p.score), False,
+         getattr(p, "eliminated", False), getattr(p, "rounds_played", 0), getattr(p, "total_penalties", 0))
+        for p in game.players.values()
+    ]
+    try:
+        await run_db(flush_game_stats, rows)
+    except Exception as e:
+        logger.error(f"Failed to save stats for ended match in group {group_id}: {e}")
 
     # ---------------- CONFIRM MESSAGE ----------------
     await query.edit_message_text(
@@ -1332,32 +1540,23 @@ async def confirm_endmatch(update: Update, context: ContextTypes.DEFAULT_TYPE):
         "⏳ All timers cleared."
     )
 
+# Counter columns are created with DEFAULT 0 and NULLs are backfilled at startup
+_USERINFO_SQL = """
+    SELECT first_name, username, games_played, wins, losses, rounds_played,
+           eliminations, total_score, last_score, penalties
+    FROM users
+    WHERE user_id = ?
+"""
+
+def fetch_user_stats(user_id: int):
+    with _db_lock:
+        return _conn.execute(_USERINFO_SQL, (user_id,)).fetchone()
+
 async def userinfo(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Show user stats in a stylish format."""
     user = update.effective_user
 
-    # Ensure all necessary columns exist before querying
-    ensure_columns_exist()
-
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-
-    # Fetch user stats safely
-    c.execute("""
-        SELECT first_name, username,
-               IFNULL(games_played,0),
-               IFNULL(wins,0),
-               IFNULL(losses,0),
-               IFNULL(rounds_played,0),
-               IFNULL(eliminations,0),
-               IFNULL(total_score,0),
-               IFNULL(last_score,0),
-               IFNULL(penalties,0)
-        FROM users
-        WHERE user_id = ?
-    """, (user.id,))
-    row = c.fetchone()
-    conn.close()
+    row = await run_db(fetch_user_stats, user.id)
 
     if not row:
         await update.message.reply_text("❌ No stats found. Play a game first!")
@@ -1388,95 +1587,6 @@ async def userinfo(update: Update, context: ContextTypes.DEFAULT_TYPE):
 """
     await update.message.reply_text(msg, parse_mode="HTML")
 
-import math
-from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
-from telegram.ext import ContextTypes
-import sqlite3
-from config import DB_PATH
-import logging
-
-# Set up logging for debugging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
-logger = logging.getLogger(__name__)
-
-def get_all_users_sorted():
-    try:
-        ensure_columns_exist()  # Ensure all columns exist before querying
-        conn = sqlite3.connect(DB_PATH)
-        conn.row_factory = sqlite3.Row  # Use Row factory for easier access
-        cursor = conn.cursor()
-        cursor.execute("""
-            SELECT 
-                user_id, 
-                IFNULL(username, '') AS username, 
-                IFNULL(first_name, '') AS first_name, 
-                IFNULL(games_played, 0) AS games_played, 
-                IFNULL(wins, 0) AS wins, 
-                IFNULL(losses, 0) AS losses, 
-                IFNULL(rounds_played, 0) AS rounds_played, 
-                IFNULL(eliminations, 0) AS eliminations, 
-                IFNULL(total_score, 0) AS total_score, 
-                IFNULL(penalties, 0) AS penalties
-            FROM users
-            ORDER BY wins DESC, total_score DESC
-            LIMIT 100  -- Limit to prevent excessive data
-        """)
-        result = cursor.fetchall()
-        conn.close()
-        logger.info(f"Fetched {len(result)} users from database")
-        return result
-    except Exception as e:
-        logger.error(f"Error in get_all_users_sorted: {e}")
-        return []
-
-def get_user_rank(user_id):
-    try:
-        all_users = get_all_users_sorted()
-        for idx, row in enumerate(all_users, start=1):
-            if row['user_id'] == user_id:
-                win_percent = round(row['wins'] / row['games_played'] * 100, 1) if row['games_played'] > 0 else 0
-                return {
-                    "username": row['username'] or row['first_name'] or "Unknown",
-                    "rank": idx,
-                    "total_users": len(all_users),
-                    "total_played": row['games_played'],
-                    "wins": row['wins'],
-                    "losses": row['losses'],
-                    "win_percent": win_percent,
-                    "rounds_played": row['rounds_played'],
-                    "eliminations": row['eliminations'],
-                    "total_score": row['total_score'],
-                    "penalties": row['penalties']
-                }
-        # Return default stats if user not found
-        return {
-            "username": "Unknown",
-            "rank": len(all_users) + 1,
-            "total_users": len(all_users),
-            "total_played": 0,
-            "wins": 0,
-            "losses": 0,
-            "win_percent": 0,
-            "rounds_played": 0,
-            "eliminations": 0,
-            "total_score": 0,
-            "penalties": 0
-        }
-    except Exception as e:
-        logger.error(f"Error in get_user_rank: {e}")
-        return {
-            "username": "Unknown",
-            "rank": 1,
-            "total_users": 0,
-            "total_played": 0,
-            "wins": 0,
-            "losses": 0,
-            "win_percent": 0,
-            "rounds_played": 0,
-            "eliminations": 0,
-            "total_score": 0,
-            "penalties": 0
-        }
 # game.py (modified to fix HTML parsing and optimize leaderboard performance)
 # Only leaderboard-related functions are updated.
 
@@ -1492,59 +1602,133 @@ import html
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-def get_all_users_sorted():
+_SORTED_SQL = """
+    SELECT
+        user_id,
+        IFNULL(username, '') AS username,
+        IFNULL(first_name, '') AS first_name,
+        IFNULL(games_played, 0) AS games_played,
+        IFNULL(wins, 0) AS wins,
+        IFNULL(losses, 0) AS losses,
+        IFNULL(rounds_played, 0) AS rounds_played,
+        IFNULL(eliminations, 0) AS eliminations,
+        IFNULL(total_score, 0) AS total_score,
+        IFNULL(penalties, 0) AS penalties
+    FROM users
+    ORDER BY wins DESC, total_score DESC, user_id
+    LIMIT ? OFFSET ?
+"""
+
+_LB_MAX_USERS = 100  # the leaderboard only ranks the top 100
+_LB_COUNT_SQL = f"SELECT MIN(COUNT(*), {_LB_MAX_USERS}) FROM users"
+
+def get_leaderboard_page(page: int, per_page: int):
+    """
+    (total_pages, page, text, stars) for one leaderboard page, page clamped to
+    the valid range. text is the header plus the page's entries; stars maps each
+    listed user_id to where their "⭐ " goes in it. Only that page's rows are
+    read, off idx_users_wins_score with LIMIT/OFFSET, and the rendered page is
+    kept until the cache expires. user_id breaks ties, so pages never overlap
+    and each row's number matches the rank get_user_rank reports.
+    """
+    now = time.monotonic()
+    if now - _LB_CACHE["ts"] >= _LB_TTL:
+        _LB_CACHE["pages"] = {}
+        _LB_CACHE["count"] = None
+        _LB_CACHE["ts"] = now
     try:
-        ensure_columns_exist()  # Ensure all columns exist before querying
-        conn = sqlite3.connect(DB_PATH, timeout=10)  # Add timeout to prevent DB locking
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
-        cursor.execute("""
-            SELECT 
-                user_id, 
-                IFNULL(username, '') AS username, 
-                IFNULL(first_name, '') AS first_name, 
-                IFNULL(games_played, 0) AS games_played, 
-                IFNULL(wins, 0) AS wins, 
-                IFNULL(losses, 0) AS losses, 
-                IFNULL(rounds_played, 0) AS rounds_played, 
-                IFNULL(eliminations, 0) AS eliminations, 
-                IFNULL(total_score, 0) AS total_score, 
-                IFNULL(penalties, 0) AS penalties
-            FROM users
-            ORDER BY wins DESC, total_score DESC
-            LIMIT 100
-        """)
-        result = cursor.fetchall()
-        conn.close()
-        logger.info(f"Fetched {len(result)} users from database")
-        return result
+        if _LB_CACHE["count"] is None:
+            with _db_lock:
+                _LB_CACHE["count"] = _conn.execute(_LB_COUNT_SQL).fetchone()[0]
+        count = _LB_CACHE["count"]
+        total_pages = max(1, math.ceil(count / per_page))
+        page = max(1, min(page, total_pages))
+        cached = _LB_CACHE["pages"].get(page)
+        if cached is None:
+            offset = (page - 1) * per_page
+            with _db_lock:
+                cursor = _conn.cursor()
+                cursor.row_factory = sqlite3.Row
+                rows = cursor.execute(_SORTED_SQL, (min(per_page, count - offset), offset)).fetchall()
+            logger.info(f"Fetched {len(rows)} users for leaderboard page {page}")
+            parts, stars, pos = [_LB_HEADER], {}, len(_LB_HEADER)
+            for rank, row in enumerate(rows, start=offset + 1):
+                uid, head, body = _lb_entry(rank, row)
+                stars[uid] = pos + len(head)
+                parts.append(head)
+                parts.append(body)
+                pos += len(head) + len(body)
+            cached = _LB_CACHE["pages"][page] = ("".join(parts), stars)
+        return (total_pages, page) + cached
     except Exception as e:
-        logger.error(f"Error in get_all_users_sorted: {e}")
-        return []
+        logger.error(f"Error in get_leaderboard_page: {e}")
+        _LB_CACHE["ts"] = 0.0
+        return 1, 1, _LB_HEADER, {}
+
+# One user's row plus their position in the leaderboard ordering. The rank
+# is a correlated COUNT over idx_users_wins_score, so it only touches the
+# index entries ahead of the user; ROW_NUMBER() would number the whole table.
+# Ties on wins and score are broken by user_id, as in _SORTED_SQL, so tied
+# users get distinct positions rather than a shared rank.
+_USER_RANK_SQL = """
+    SELECT
+        u.user_id,
+        IFNULL(u.username, '') AS username,
+        IFNULL(u.first_name, '') AS first_name,
+        IFNULL(u.games_played, 0) AS games_played,
+        IFNULL(u.wins, 0) AS wins,
+        IFNULL(u.losses, 0) AS losses,
+        IFNULL(u.rounds_played, 0) AS rounds_played,
+        IFNULL(u.eliminations, 0) AS eliminations,
+        IFNULL(u.total_score, 0) AS total_score,
+        IFNULL(u.penalties, 0) AS penalties,
+        (
+            SELECT 1 + COUNT(*) FROM users o
+            WHERE IFNULL(o.wins, 0) > IFNULL(u.wins, 0)
+               OR (IFNULL(o.wins, 0) = IFNULL(u.wins, 0) AND IFNULL(o.total_score, 0) > IFNULL(u.total_score, 0))
+               OR (IFNULL(o.wins, 0) = IFNULL(u.wins, 0) AND IFNULL(o.total_score, 0) = IFNULL(u.total_score, 0)
+                   AND o.user_id < u.user_id)
+        ) AS rank
+    FROM users u
+    WHERE u.user_id = ?
+"""
+
+_COUNT_USERS_SQL = "SELECT COUNT(*) FROM users"
+
+def _lookup_user_rank(user_id):
+    """(rank, row) for a user, or (None, None) if unknown."""
+    with _db_lock:
+        cursor = _conn.cursor()
+        cursor.row_factory = sqlite3.Row
+        row = cursor.execute(_USER_RANK_SQL, (user_id,)).fetchone()
+    if row is None:
+        return None, None
+    return row['rank'], row
 
 def get_user_rank(user_id):
     try:
-        all_users = get_all_users_sorted()
-        for idx, row in enumerate(all_users, start=1):
-            if row['user_id'] == user_id:
-                win_percent = round(row['wins'] / row['games_played'] * 100, 1) if row['games_played'] > 0 else 0
-                return {
-                    "username": row['username'] or row['first_name'] or "Unknown",
-                    "rank": idx,
-                    "total_users": len(all_users),
-                    "total_played": row['games_played'],
-                    "wins": row['wins'],
-                    "losses": row['losses'],
-                    "win_percent": win_percent,
-                    "rounds_played": row['rounds_played'],
-                    "eliminations": row['eliminations'],
-                    "total_score": row['total_score'],
-                    "penalties": row['penalties']
-                }
+        idx, row = _lookup_user_rank(user_id)
+        with _db_lock:
+            total_users = _conn.execute(_COUNT_USERS_SQL).fetchone()[0]
+        if row is not None:
+            win_percent = round(row['wins'] / row['games_played'] * 100, 1) if row['games_played'] > 0 else 0
+            return {
+                "username": row['username'] or row['first_name'] or "Unknown",
+                "rank": idx,
+                "total_users": total_users,
+                "total_played": row['games_played'],
+                "wins": row['wins'],
+                "losses": row['losses'],
+                "win_percent": win_percent,
+                "rounds_played": row['rounds_played'],
+                "eliminations": row['eliminations'],
+                "total_score": row['total_score'],
+                "penalties": row['penalties']
+            }
         return {
             "username": "Unknown",
-            "rank": len(all_users) + 1,
-            "total_users": len(all_users),
+            "rank": total_users + 1,
+            "total_users": total_users,
             "total_played": 0,
             "wins": 0,
             "losses": 0,
@@ -1570,98 +1754,93 @@ def get_user_rank(user_id):
             "penalties": 0
         }
 
+_LB_BANNER_URL = "https://graph.org/file/ca04194ed4b8b48eafcab-ab92ca372392f43809.jpg"
+_LB_HEADER = "<b>──✦ Player Spotlight ✦──</b>\n\n"
+_LB_SEP = "<b>────⊱◈◈◈⊰────</b>\n"
+
+def _lb_entry(rank: int, row):
+    """
+    (user_id, head, body) for one leaderboard row. The viewer's own row gets
+    its star between head and body, so the text is shared by every viewer.
+    """
+    games_played = row['games_played'] or 0
+    wins = row['wins'] or 0
+    losses = row['losses'] or 0
+    rounds_played = row['rounds_played'] or 0
+    eliminations = row['eliminations'] or 0
+    total_score = row['total_score'] or 0
+    penalties = row['penalties'] or 0
+    win_percent = round(wins / games_played * 100, 1) if games_played > 0 else 0
+    display_name = html.escape(row['first_name'] or "Unknown")  # Escape to prevent HTML issues
+    return (
+        row['user_id'],
+        f"{_LB_SEP}{rank}. ",
+        f"{display_name}\n"
+        f"   ⧉ Win%: {win_percent} | 🎮 {games_played}\n"
+        f"   🏆 {wins} | {losses} Lost\n"
+        f"   🔄 Rounds: {rounds_played} | ☠️ Elim: {eliminations}\n"
+        f"   ⭐ Score: {total_score} | ⛔ Pen: {penalties}\n"
+        f"   ID: {row['user_id']}\n"
+    )
+
+@lru_cache(maxsize=64)
+def _lb_nav_kb(page: int, total_pages: int) -> Optional[InlineKeyboardMarkup]:
+    if total_pages <= 1:
+        return None
+    buttons = []
+    if page > 1:
+        buttons.append(InlineKeyboardButton("◄ Previous", callback_data=f"leaderboard_{page-1}"))
+    if page < total_pages:
+        buttons.append(InlineKeyboardButton("Next ►", callback_data=f"leaderboard_{page+1}"))
+    return InlineKeyboardMarkup([buttons])
+
 async def generate_leaderboard_task(update: Update, context: ContextTypes.DEFAULT_TYPE, page: int):
     user_id = update.effective_user.id
-    all_users = get_all_users_sorted()
-    per_page = 5
-    total_pages = max(1, math.ceil(len(all_users) / per_page))
-    page = max(1, min(page, total_pages))
-    logger.info(f"Total users: {len(all_users)}, Total pages: {total_pages}, Current page: {page}")
-
-    # Build caption with proper HTML escaping
-    text = "<b>──✦ Player Spotlight ✦──</b>\n\n"
-    user_in_page = False
-    user_stats = None
-
-    start_idx = (page - 1) * per_page
-    end_idx = min(start_idx + per_page, len(all_users))
-
-    for i, row in enumerate(all_users[start_idx:end_idx], start=start_idx + 1):
-        games_played = row['games_played'] or 0
-        wins = row['wins'] or 0
-        losses = row['losses'] or 0
-        rounds_played = row['rounds_played'] or 0
-        eliminations = row['eliminations'] or 0
-        total_score = row['total_score'] or 0
-        penalties = row['penalties'] or 0
-        win_percent = round(wins / games_played * 100, 1) if games_played > 0 else 0
-        display_name = html.escape(row['first_name'] or "Unknown")  # Escape to prevent HTML issues
-        highlight = "⭐ " if row['user_id'] == user_id else ""
-        text += "<b>────⊱◈◈◈⊰────</b>\n"
-        text += f"{i}. {highlight}{display_name}\n"
-        text += f"   ⧉ Win%: {win_percent} | 🎮 {games_played}\n"
-        text += f"   🏆 {wins} | {losses} Lost\n"
-        text += f"   🔄 Rounds: {rounds_played} | ☠️ Elim: {eliminations}\n"
-        text += f"   ⭐ Score: {total_score} | ⛔ Pen: {penalties}\n"
-        text += f"   ID: {row['user_id']}\n"
-        if row['user_id'] == user_id:
-            user_in_page = True
-            user_stats = {
-                "rank": i,
-                "username": display_name,
-                "total_played": games_played,
-                "wins": wins,
-                "losses": losses,
-                "win_percent": win_percent,
-                "rounds_played": rounds_played,
-                "eliminations": eliminations,
-                "total_score": total_score,
-                "penalties": penalties
-            }
+    total_pages, page, page_text, stars = await run_db(get_leaderboard_page, page, 5)
+    logger.info(f"Total pages: {total_pages}, Current page: {page}")
+
+    # The rendered page is shared; only the viewer's star or rank footer is added per call
+    star_at = stars.get(user_id)
+    if star_at is not None:
+        parts = [page_text[:star_at], "⭐ ", page_text[star_at:]]
+    else:
+        parts = [page_text]
+        user_stats = await run_db(get_user_rank, user_id)
+        parts.append(
+            f"\n{_LB_SEP}"
+            f"📌 Your Rank:\n"
+            f"{user_stats['rank']}. {html.escape(user_stats['username'])}\n"
+            f"   ⧉ Win%: {user_stats['win_percent']} | 🎮 {user_stats['total_played']}\n"
+            f"   🏆 {user_stats['wins']} | {user_stats['losses']} Lost\n"
+            f"   🔄 Rounds: {user_stats['rounds_played']} | ☠️ Elim: {user_stats['eliminations']}\n"
+            f"   ⭐ Score: {user_stats['total_score']} | ⛔ Pen: {user_stats['penalties']}\n"
+            f"   ID: {user_id}\n"
+        )
+
+    parts.append(f"{_LB_SEP}Page {page}/{total_pages}")
+    text = "".join(parts)
 
-    if not user_in_page:
-        user_stats = get_user_rank(user_id)
-        text += f"\n<b>────⊱◈◈◈⊰────</b>\n"
-        text += f"📌 Your Rank:\n"
-        text += f"{user_stats['rank']}. {html.escape(user_stats['username'])}\n"
-        text += f"   ⧉ Win%: {user_stats['win_percent']} | 🎮 {user_stats['total_played']}\n"
-        text += f"   🏆 {user_stats['wins']} | {user_stats['losses']} Lost\n"
-        text += f"   🔄 Rounds: {user_stats['rounds_played']} | ☠️ Elim: {user_stats['eliminations']}\n"
-        text += f"   ⭐ Score: {user_stats['total_score']} | ⛔ Pen: {user_stats['penalties']}\n"
-        text += f"   ID: {user_id}\n"
-
-    text += f"<b>────⊱◈◈◈⊰────</b>\nPage {page}/{total_pages}"
-
-    keyboard = []
-    if total_pages > 1:
-        buttons = []
-        if page > 1:
-            buttons.append(InlineKeyboardButton("◄ Previous", callback_data=f"leaderboard_{page-1}"))
-        if page < total_pages:
-            buttons.append(InlineKeyboardButton("Next ►", callback_data=f"leaderboard_{page+1}"))
-        keyboard.append(buttons)
-        logger.info(f"Buttons created: {buttons}")
-
-    reply_markup = InlineKeyboardMarkup(keyboard) if keyboard else None
-    image_url = "https://graph.org/file/ca04194ed4b8b48eafcab-ab92ca372392f43809.jpg"
+    reply_markup = _lb_nav_kb(page, total_pages)
 
     try:
         if update.callback_query:
             logger.info("Editing message with new leaderboard image and caption")
-            await update.callback_query.message.edit_media(
+            edited = await update.callback_query.message.edit_media(
                 media=InputMediaPhoto(
-                    media=image_url,
+                    media=_file_ids.get(_LB_BANNER_URL, _LB_BANNER_URL),
                     caption=text,
                     parse_mode="HTML"
                 ),
                 reply_markup=reply_markup
             )
+            await remember_file_id(_LB_BANNER_URL, edited)
             await update.callback_query.answer()
             logger.info("Callback query answered successfully")
         else:
             logger.info("Sending new leaderboard image with caption")
-            await update.message.reply_photo(
-                photo=image_url,
+            await reply_photo_cached(
+                update.message,
+                _LB_BANNER_URL,
                 caption=text,
                 reply_markup=reply_markup,
                 parse_mode="HTML"
@@ -1711,7 +1890,7 @@ async def leaderboard_callback(update: Update, context: ContextTypes.DEFAULT_TYP
 
 async def users_rank(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_id = update.effective_user.id
-    stats = get_user_rank(user_id)
+    stats = await run_db(get_user_rank, user_id)
 
     text = (
         f"🏆 𝐘𝐎𝐔𝐑 𝐑𝐀𝐍𝐊\n\n"
@@ -1723,62 +1902,53 @@ async def users_rank(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     await update.message.reply_text(text, parse_mode="HTML")
 # Add new forcestart command handler
+_FORCESTART_PRIVATE = "⚠️ 𝗙𝗼𝗿𝗰𝗲 𝗦𝘁𝗮𝗿𝘁\n\n❌ Use this command in the group only."
+_FORCESTART_UNVERIFIED = "⚠️ 𝗙𝗼𝗿𝗰𝗲 𝗦𝘁𝗮𝗿𝘁\n\n❌ Could not verify admin status."
+_FORCESTART_NOT_ADMIN = "⚠️ 𝗙𝗼𝗿𝗰𝗲 𝗦𝘁𝗮𝗿𝘁\n\n❌ Only group admins can use this command."
+_FORCESTART_NO_GAME = "⚠️ 𝗙𝗼𝗿𝗰𝗲 𝗦𝘁𝗮𝗿𝘁\n\n❌ No active game to start."
+_FORCESTART_JOIN_CLOSED = "⚠️ 𝗙𝗼𝗿𝗰𝗲 𝗦𝘁𝗮𝗿𝘁\n\n❌ Join phase is already closed!"
+_FORCESTART_NOT_ENOUGH = "⚠️ 𝗙𝗼𝗿𝗰𝗲 𝗦𝘁𝗮𝗿𝘁\n\n❌ Not enough players joined ({joined}/{minimum})."
+
 async def forcestart(update: Update, context: ContextTypes.DEFAULT_TYPE):
     chat = update.effective_chat
     user = update.effective_user
 
     if chat.type == 'private':
-        await update.message.reply_text(
-            "⚠️ 𝗙𝗼𝗿𝗰𝗲 𝗦𝘁𝗮𝗿𝘁\n\n❌ Use this command in the group only."
-        )
+        await update.message.reply_text(_FORCESTART_PRIVATE)
         return
 
     group_id = chat.id
 
     # Admin check
     try:
-        member = await context.bot.get_chat_member(group_id, user.id)
-        if member.status not in ["administrator", "creator"]:
-            await update.message.reply_text(
-                "⚠️ 𝗙𝗼𝗿𝗰𝗲 𝗦𝘁𝗮𝗿𝘁\n\n❌ Only group admins can use this command."
-            )
-            return
+        is_admin = await _is_admin(context.bot, group_id, user.id)
     except:
-        await update.message.reply_text(
-            "⚠️ 𝗙𝗼𝗿𝗰𝗲 𝗦𝘁𝗮𝗿𝘁\n\n❌ Could not verify admin status."
-        )
-        return
-
-    # Check if a game exists
-    if group_id not in active_games:
-        await update.message.reply_text(
-            "⚠️ 𝗙𝗼𝗿𝗰𝗲 𝗦𝘁𝗮𝗿𝘁\n\n❌ No active game to start."
-        )
-        return
-
-    game = active_games[group_id]
-
-    # Check if join phase is active
-    if not game.join_phase_active:
-        await update.message.reply_text(
-            "⚠️ 𝗙𝗼𝗿𝗰𝗲 𝗦𝘁𝗮𝗿𝘁\n\n❌ Join phase is already closed!"
-        )
+        logger.warning("Force start in %s: could not verify admin status of %s", group_id, user.id)
+        await update.message.reply_text(_FORCESTART_UNVERIFIED)
         return
 
-    # Check minimum players
-    if len(game.players) < MIN_PLAYERS:
-        await update.message.reply_text(
-            f"⚠️ 𝗙𝗼𝗿𝗰𝗲 𝗦𝘁𝗮𝗿𝘁\n\n❌ Not enough players joined ({len(game.players)}/{MIN_PLAYERS})."
-        )
-        return
+    # First failing check replies and aborts; later checks may rely on earlier ones
+    game = active_games.get(group_id)
+    checks = (
+        (lambda: not is_admin, _FORCESTART_NOT_ADMIN, "not an admin"),
+        (lambda: game is None, _FORCESTART_NO_GAME, "no game"),
+        (lambda: not game.join_phase_active, _FORCESTART_JOIN_CLOSED, "join phase closed"),
+        (lambda: len(game.players) < MIN_PLAYERS, _FORCESTART_NOT_ENOUGH, "not enough players"),
+    )
+    for failed, message, reason in checks:
+        if failed():
+            joined = len(game.players) if game else 0
+            logger.info("Force start rejected in %s by %s: %s (%d/%d players)", group_id, user.id, reason, joined, MIN_PLAYERS)
+            await update.message.reply_text(message.format(joined=joined, minimum=MIN_PLAYERS))
+            return
 
     # Cancel join phase timer
-    if game.join_timer_task and not game.join_timer_task.done():
-        game.join_timer_task.cancel()
-        game.join_timer_task = None
+    game.cancel_join_timer()
 
-    # End join phase and start game
+    # End join phase and start game; the announcement goes out first so the
+    # group sees it before the match-settled and round messages
     game.join_phase_active = False
+    logger.info("Force start in %s by %s with %d players", group_id, user.id, len(game.players))
     await context.bot.send_message(
         chat_id=group_id,
         text=f"🚀 𝗙𝗼𝗿𝗰𝗲 𝗦𝘁𝗮𝗿𝘁\n\n✅ Admin has started the game early!"
@@ -1787,18 +1957,54 @@ async def forcestart(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 #handlers
 
+def _init_schema():
+    global _schema_ready
+    if not _schema_ready:
+        init_user_table()
+        init_group_table()  # NEW: Initialize groups table
+        ensure_columns_exist()
+        init_file_cache()
+        # Refresh planner statistics for the indexes above; analysis_limit keeps this quick on big tables
+        with _db_lock:
+            _conn.execute("PRAGMA analysis_limit=400")
+            _conn.execute("ANALYZE")
+        _schema_ready = True
+
+
+_LOBBY_COMMANDS = {
+    "startgame": startgame,
+    "join": join,
+    "leave": leave,
+    "players": players,
+}
+# Commands that wait on Telegram API calls or the database run as
+# non-blocking handlers so they don't hold up updates from other chats.
+_NONBLOCKING_COMMANDS = {
+    "endgame": endmatch,
+    "forcestart": forcestart,
+    "userinfo": userinfo,
+    "leaderboard": leaderboard_command,
+    "users_rank": users_rank,
+}
+
+
 def register_handlers(app):
-    init_user_table()
-    init_group_table()  # NEW: Initialize groups table
-    app.add_handler(CommandHandler("startgame", startgame))
-    app.add_handler(CommandHandler("join", join))
-    app.add_handler(CommandHandler("leave", leave))
-    app.add_handler(CommandHandler("players", players))
-    app.add_handler(CommandHandler("endgame", endmatch))
-    app.add_handler(CommandHandler("forcestart", forcestart))
-    app.add_handler(CommandHandler("userinfo", userinfo))
-    app.add_handler(CommandHandler("leaderboard", leaderboard_command))
-    app.add_handler(CommandHandler("users_rank", users_rank))
+    # Create the tables from post_init in a worker thread so the DDL never
+    # blocks the event loop; post_init finishes before polling starts.
+    previous_post_init = app.post_init
+
+    async def post_init(application):
+        if previous_post_init:
+            await previous_post_init(application)
+        await run_db(_init_schema)
+        # Bot.initialize() has already fetched get_me(); keep the username for start_round
+        application.bot_data["bot_username"] = application.bot.username or ""
+
+    app.post_init = post_init
+    for command, callback in _LOBBY_COMMANDS.items():
+        app.add_handler(CommandHandler(command, callback))
+    for command, callback in _NONBLOCKING_COMMANDS.items():
+        app.add_handler(CommandHandler(command, callback, block=False))
     app.add_handler(
         CallbackQueryHandler(confirm_endmatch, pattern=r"^confirm_endmatch:-?\d+$")
     )
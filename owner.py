@@ -1,9 +1,11 @@
 # owner.py
+import asyncio
 import sqlite3
 from telegram import Update, InlineKeyboardMarkup, InlineKeyboardButton
 from telegram.ext import CommandHandler, ContextTypes
 
 from config import DB_PATH, OWNER_ID, LOG_CHAT_ID  # Assuming LOG_CHAT_ID exists for logging
+from game import invalidate_leaderboard_cache
 
 # ---------------- Database Initialization for Mods ----------------
 def init_mods_db():
@@ -98,6 +100,7 @@ def reset_user_stats(user_id: int) -> bool:
     )
     conn.commit()
     conn.close()
+    invalidate_leaderboard_cache()  # drop rendered pages showing the old stats
     return True
 
 # ---------------- Command Handlers ----------------
@@ -114,7 +117,7 @@ async def addmod(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return
 
     mod_user = reply.from_user
-    if add_mod(mod_user.id, mod_user.username or mod_user.full_name):
+    if await asyncio.to_thread(add_mod, mod_user.id, mod_user.username or mod_user.full_name):
         await update.message.reply_text(f"✅ Added @{mod_user.username or mod_user.full_name} as mod.")
         # Log to LOG_CHAT_ID if exists
         if LOG_CHAT_ID:
@@ -143,7 +146,7 @@ async def rmmod(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text("❌ Provide a user ID or reply to a user's message to remove mod.")
         return
 
-    if remove_mod(mod_id):
+    if await asyncio.to_thread(remove_mod, mod_id):
         await update.message.reply_text(f"✅ Removed mod with ID {mod_id}.")
         # Log to LOG_CHAT_ID if exists
         if LOG_CHAT_ID:
@@ -158,21 +161,21 @@ async def mods(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text("❌ You are not authorized to use this command.")
         return
 
-    mod_list = get_all_mods()
+    mod_list = await asyncio.to_thread(get_all_mods)
     if not mod_list:
         await update.message.reply_text("❌ No mods added yet.")
         return
 
-    text = "📋 List of Mods:\n\n"
-    for i, (mod_id, username) in enumerate(mod_list, 1):
-        text += f"{i}. @{username or 'N/A'} (ID: {mod_id})\n"
+    text = "📋 List of Mods:\n\n" + "".join(
+        f"{i}. @{username or 'N/A'} (ID: {mod_id})\n" for i, (mod_id, username) in enumerate(mod_list, 1)
+    )
 
     await update.message.reply_text(text)
 
 async def reset(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Mod/Owner-only: Reset user stats by userid or reply."""
     user = update.effective_user
-    if not (is_owner(user.id) or is_mod(user.id)):
+    if not (is_owner(user.id) or await asyncio.to_thread(is_mod, user.id)):
         await update.message.reply_text("❌ You are not authorized to use this command.")
         return
 
@@ -190,7 +193,7 @@ async def reset(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text("❌ Provide a user ID or reply to a user's message to reset stats.")
         return
 
-    if reset_user_stats(target_id):
+    if await asyncio.to_thread(reset_user_stats, target_id):
         await update.message.reply_text(f"✅ Reset stats for user ID {target_id}.")
         # Log to LOG_CHAT_ID if exists
         if LOG_CHAT_ID: